@@ -32,7 +32,8 @@ find "$BUILD_DIR" -type f -name '*.py' | while read -r py_file; do
     echo "  Compiling $(basename "$py_file") to $(basename "$mpy_file")"
     
     # Compile to .mpy using mpy-cross
-    if mpy-cross "$py_file" -o "$mpy_file"; then
+    # -march lets viper functions (e.g. microdot/websocket_native.py) compile to native code
+    if mpy-cross -march=armv6m "$py_file" -o "$mpy_file"; then
       # Remove original .py file after successful compilation
       rm "$py_file"
     else
@@ -95,7 +96,11 @@ for html in "$TEMPLATES_BUILD/"*.html; do
   rm -f "$html"
 done
 
-# Step 7: Upload to Pico W
+# Step 7: Generate the static asset manifest (URL -> file, size, ETag, headers)
+echo "🗂️ Generating asset manifest..."
+python3 "$SRC_DIR/../build_asset_manifest.py" "$BUILD_DIR"
+
+# Step 8: Upload to Pico W
 echo "📡 Uploading entire build/ to Pico W..."
 mpremote connect tty.usbmodem* fs cp -r "$BUILD_DIR" :
 
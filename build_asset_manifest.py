@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Generate the static asset manifest for a build directory.
+
+Writes asset-manifest.json to the build directory, describing every file
+under static/ and the page templates, so that the server can answer requests
+for them without inspecting the filesystem.
+
+Usage: python3 build_asset_manifest.py <build_dir> [max_age]
+"""
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'src', 'lib'))
+from microdot import Response  # noqa: E402
+
+MANIFEST_FILE = 'asset-manifest.json'
+DEFAULT_MAX_AGE = 31536000
+
+# Templates served at fixed URLs (everything under static/ is added
+# automatically)
+PAGES = {
+    '/': 'templates/dashboard.min.html.gz',
+}
+
+
+def describe(build_dir, path, max_age):
+    """Build the manifest entry for a file, relative to the build directory"""
+    with open(os.path.join(build_dir, path), 'rb') as f:
+        data = f.read()
+
+    name = path
+    encoding = None
+    if name.endswith('.gz'):
+        name = name[:-3]
+        encoding = 'gzip'
+    content_type = Response.types_map.get(name.split('.')[-1],
+                                          'application/octet-stream')
+    etag = '"{}"'.format(hashlib.sha1(data).hexdigest()[:16])
+
+    # Headers written verbatim; Content-Type and Content-Length are added by
+    # the server
+    headers = ''
+    if encoding:
+        headers += 'Content-Encoding: {}\r\nVary: Accept-Encoding\r\n'.format(
+            encoding)
+    if max_age is not None:
+        headers += 'Cache-Control: max-age={}\r\n'.format(max_age)
+    headers += 'ETag: {}\r\nAccept-Ranges: bytes\r\n'.format(etag)
+
+    return {
+        'file': path,
+        'size': len(data),
+        'etag': etag,
+        'content_type': content_type,
+        'encoding': encoding,
+        'max_age': max_age,
+        'headers': headers,
+    }
+
+
+def build_manifest(build_dir, max_age=DEFAULT_MAX_AGE):
+    manifest = {}
+    for url, path in PAGES.items():
+        if os.path.exists(os.path.join(build_dir, path)):
+            manifest[url] = describe(build_dir, path, max_age)
+        else:
+            print(f"  ⚠️ Missing page {path} for {url}")
+
+    for root, _, files in os.walk(os.path.join(build_dir, 'static')):
+        for filename in sorted(files):
+            path = os.path.relpath(os.path.join(root, filename),
+                                   build_dir).replace(os.sep, '/')
+            url = '/' + (path[:-3] if path.endswith('.gz') else path)
+            manifest[url] = describe(build_dir, path, max_age)
+    return manifest
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(1)
+    build_dir = sys.argv[1]
+    max_age = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MAX_AGE
+    manifest = build_manifest(build_dir, max_age)
+    with open(os.path.join(build_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    print(f"  Wrote {MANIFEST_FILE} with {len(manifest)} assets")
@@ -3,6 +3,34 @@ SERVER_PORT = 80
 SERVER_NAME = "Audio Dashboard"
 VERSION = "1.0.0"
 
+# HTTP Connection Configuration
+HTTP_KEEP_ALIVE = True
+HTTP_KEEP_ALIVE_TIMEOUT = 5  # seconds
+HTTP_MAX_KEEP_ALIVE_REQUESTS = 20
+HTTP_HEADER_TIMEOUT = 5  # seconds to receive the request line and headers
+HTTP_BODY_TIMEOUT = 10  # seconds to receive the request body (each read, for streamed bodies)
+HTTP_WRITE_TIMEOUT = 10  # seconds for each write of the response
+HTTP_MAX_CONNECTIONS = 6  # concurrent connections (0 = no limit)
+HTTP_MAX_WAITING_CONNECTIONS = 4  # queued beyond the limit, the rest get a 503
+HTTP_CONNECTION_WAIT_TIMEOUT = 3  # seconds a queued connection waits before it gets a 503
+# (free heap bytes, max connections): lower the limit when memory runs low
+HTTP_HEAP_PRESSURE_LIMITS = [(32 * 1024, 3), (16 * 1024, 1)]
+
+# Static Asset Cache Configuration (set STATIC_CACHE_MAX_SIZE to 0 to disable)
+STATIC_CACHE_MAX_SIZE = 32 * 1024  # bytes
+STATIC_CACHE_MAX_ITEM_SIZE = 16 * 1024  # bytes
+ASSET_MANIFEST_FILE = 'asset-manifest.json'  # generated by the build, optional
+
+# Metrics Configuration
+METRICS_SAMPLE_EVERY = 1  # time one in N requests (0 = metrics disabled)
+METRICS_LOOP_LAG_INTERVAL_MS = 100  # event loop lag probe period
+
+# Dual-core Configuration (ADC sampling, buttons and UART writes on core 1)
+DUAL_CORE_ENABLED = False
+CORE1_INTERVAL_MS = 10  # core 1 polling period
+CORE1_DISPATCH_INTERVAL_MS = 20  # how often core 0 picks up core 1 events
+CORE1_QUEUE_SIZE = 32  # messages buffered in each direction
+
 # WiFi Configuration
 WIFI_MODES = ['station', 'ap', 'dual']
 MIN_PASSWORD_LENGTH = 8
@@ -28,10 +56,21 @@ WS_MESSAGES = {
     'FEEDBACK_TOGGLE': 'toggle_feedback',
     'MUTE_TOGGLE': 'toggle_mute',
     'GET_STATE': 'get_current_state',
+    'RESYNC': 'resync',
+    'DELTA': 'delta',
     'UART_COMMAND': 'uart_command',
     'UART_STATE_UPDATE': 'uart_state_update'
 }
 
+# WebSocket Send Queue Configuration
+WS_SEND_QUEUE_SIZE = 8  # frames waiting per client (newer frames replace older ones of the same type)
+WS_SEND_TIMEOUT = 5  # seconds to write one frame before the client is dropped
+WS_STALL_TIMEOUT = 5  # seconds a client may stay with a full queue before it is dropped
+WS_EQ_BROADCAST_INTERVAL_MS = 33  # at most one EQ update per interval (~30 Hz), 0 sends every change
+
+# Server-Sent Events Configuration
+SSE_HEARTBEAT_INTERVAL = 15  # seconds between keep-alive comments
+
 # HTTP Status Codes
 HTTP_OK = 200
 HTTP_BAD_REQUEST = 400
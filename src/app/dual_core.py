@@ -0,0 +1,147 @@
+"""
+Dual-core mode: dial sampling, button polling and UART writes on core 1
+
+Core 1 runs a plain polling loop started with _thread. It never touches the
+model state: it hands raw dial readings and button presses to core 0, which
+applies them from an asyncio task, and it writes the UART commands that core
+0 queues. On CPython the same loop runs on a worker thread.
+"""
+import _thread
+from array import array
+
+try:
+    import utime as time
+except ImportError:
+    import time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+class MessageQueue:
+    """Fixed-size ring buffer protected by a lock, for passing messages between cores"""
+
+    def __init__(self, size=32):
+        self.lock = _thread.allocate_lock()
+        self.items = [None] * size
+        self.head = 0
+        self.count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        """Add an item, returns False (and drops it) if the queue is full"""
+        with self.lock:
+            if self.count == len(self.items):
+                self.dropped += 1
+                return False
+            self.items[(self.head + self.count) % len(self.items)] = item
+            self.count += 1
+        return True
+
+    def get(self):
+        """Remove and return the oldest item, or None if the queue is empty"""
+        with self.lock:
+            if not self.count:
+                return None
+            item = self.items[self.head]
+            self.items[self.head] = None
+            self.head = (self.head + 1) % len(self.items)
+            self.count -= 1
+        return item
+
+class DualCoreWorker:
+    """Runs the hardware polling on core 1 and relays its results to core 0"""
+
+    def __init__(self, model, uart_service, interval_ms=10, queue_size=32):
+        self.model = model
+        self.uart_service = uart_service
+        self.interval_ms = interval_ms
+        self.commands = MessageQueue(queue_size)  # core 0 -> core 1: (param, value)
+        self.presses = MessageQueue(queue_size)  # core 1 -> core 0: button pin numbers
+
+        # Latest dial readings; only the newest sample matters, so it is a
+        # single slot rather than a queue
+        self.bands = tuple(model.eq_processor.adc)
+        self.dials_lock = _thread.allocate_lock()
+        self.dials = array('l', [0] * len(self.bands))
+        self.dials_pending = False
+        # Readings are passed on when a band moves by more than this
+        self.dial_threshold = model.eq_processor.deadzone // 2
+
+        self.running = False
+        self.stopped = True
+
+    def start(self):
+        """Start core 1 and route UART commands through it"""
+        self.running = True
+        self.stopped = False
+        self.uart_service.queue = self.commands
+        _thread.start_new_thread(self._core1_loop, ())
+
+    def stop(self, timeout_ms=500):
+        """Stop core 1, waiting for its loop to exit, and write UART commands directly again"""
+        self.running = False
+        self.uart_service.queue = None
+        for _ in range(timeout_ms // self.interval_ms):
+            if self.stopped:
+                break
+            time.sleep(self.interval_ms / 1000)
+
+    # === Core 1 ===
+
+    def _core1_loop(self):
+        adcs = tuple(self.model.eq_processor.adc[band] for band in self.bands)
+        samples = array('l', [0] * len(adcs))
+        posted = array('l', [-1 << 20] * len(adcs))
+        buttons = self.model.button_manager
+        try:
+            while self.running:
+                # UART commands queued by core 0
+                command = self.commands.get()
+                while command is not None:
+                    self.uart_service.write_command(command[0], command[1])
+                    command = self.commands.get()
+
+                # Dials
+                changed = False
+                for i in range(len(adcs)):
+                    samples[i] = adcs[i].read_u16()
+                    if abs(samples[i] - posted[i]) > self.dial_threshold:
+                        changed = True
+                if changed:
+                    with self.dials_lock:
+                        for i in range(len(samples)):
+                            self.dials[i] = posted[i] = samples[i]
+                        self.dials_pending = True
+
+                # Buttons
+                buttons.poll(self.presses.put)
+
+                time.sleep(self.interval_ms / 1000)
+        finally:
+            self.stopped = True
+
+    # === Core 0 ===
+
+    def dispatch_events(self):
+        """Apply the dial readings and button presses received from core 1"""
+        if self.dials_pending:
+            with self.dials_lock:
+                current = {band: self.dials[i] for i, band in enumerate(self.bands)}
+                self.dials_pending = False
+            self.model.eq_processor.process_dials(current)
+
+        pin_number = self.presses.get()
+        while pin_number is not None:
+            self.model.button_manager.press(pin_number)
+            pin_number = self.presses.get()
+
+    async def dispatch_loop(self, interval_ms=20):
+        """Core 0 task that picks up core 1 events"""
+        while self.running:
+            try:
+                self.dispatch_events()
+            except Exception as e:
+                print(f"[CORE1] Error dispatching events: {e}")
+            await asyncio.sleep(interval_ms / 1000)
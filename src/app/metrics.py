@@ -0,0 +1,137 @@
+"""
+Prometheus metrics exporter
+"""
+import gc
+import utime
+import uasyncio as asyncio
+from .middleware import RequestMetrics
+
+class MetricsExporter:
+    """Renders the application counters in the Prometheus text format.
+    
+    The counters are maintained by their owners as requests and messages go
+    by (RequestMetrics, WebSocketManager, UARTService, EQProcessor), so a
+    scrape only reads them. The output is produced line by line from a
+    generator and streamed with chunked encoding, so no document is built in
+    memory and no collection is forced.
+    """
+    
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def __init__(self, app, model, uart_service, request_metrics):
+        self.app = app
+        self.model = model
+        self.uart_service = uart_service
+        self.request_metrics = request_metrics
+        # Histogram bucket labels, in seconds
+        self.bucket_labels = tuple(
+            _format_us(bound) for bound in RequestMetrics.BUCKETS_US) + ('+Inf',)
+        self.loop_lag_us = 0
+        self.loop_lag_max_us = 0
+    
+    async def monitor_loop_lag(self, interval_ms=100):
+        """Measure how late the event loop wakes up a sleeping task"""
+        while True:
+            start = utime.ticks_us()
+            await asyncio.sleep_ms(interval_ms)
+            lag = utime.ticks_diff(utime.ticks_us(), start) - interval_ms * 1000
+            self.loop_lag_us = max(lag, 0)
+            if self.loop_lag_us > self.loop_lag_max_us:
+                self.loop_lag_max_us = self.loop_lag_us
+    
+    def get_metrics(self, request):
+        """Return the metrics as a streamed text response"""
+        return self.render(), 200, {'Content-Type': self.CONTENT_TYPE}
+    
+    def render(self):
+        """Generate the metrics exposition one line at a time"""
+        # HTTP requests; the route tables are copied because requests served
+        # while the scrape is being written can add entries to them
+        yield '# HELP http_requests_total HTTP requests by route and status.\n'
+        yield '# TYPE http_requests_total counter\n'
+        routes = list(self.request_metrics.routes.items())
+        for route, stats in routes:
+            route = route or 'unmatched'
+            for status, count in list(stats.statuses.items()):
+                yield 'http_requests_total{route="%s",status="%d"} %d\n' % (
+                    route, status, count)
+        
+        yield '# HELP http_request_duration_seconds Sampled HTTP request latency.\n'
+        yield '# TYPE http_request_duration_seconds histogram\n'
+        for route, stats in routes:
+            route = route or 'unmatched'
+            latency = stats.latency
+            total = 0
+            for i in range(len(self.bucket_labels)):
+                total += latency[i + 3]
+                yield 'http_request_duration_seconds_bucket{route="%s",le="%s"} %d\n' % (
+                    route, self.bucket_labels[i], total)
+            yield 'http_request_duration_seconds_sum{route="%s"} %d.%06d\n' % (
+                route, latency[1], latency[2])
+            yield 'http_request_duration_seconds_count{route="%s"} %d\n' % (
+                route, latency[0])
+        
+        # HTTP connections
+        app = self.app
+        yield '# TYPE http_connections_active gauge\n'
+        yield 'http_connections_active %d\n' % app.active_connections
+        yield '# TYPE http_connections_waiting gauge\n'
+        yield 'http_connections_waiting %d\n' % app.waiting_connections
+        yield '# TYPE http_connections_rejected_total counter\n'
+        yield 'http_connections_rejected_total %d\n' % app.rejected_connections
+        yield '# TYPE http_connections_reaped_total counter\n'
+        yield 'http_connections_reaped_total %d\n' % app.reaped_connections
+        
+        # Push clients and messages
+        ws_manager = self.model.ws_manager
+        yield '# HELP ws_clients Connected push clients by transport.\n'
+        yield '# TYPE ws_clients gauge\n'
+        yield 'ws_clients{transport="websocket"} %d\n' % len(ws_manager.clients)
+        yield 'ws_clients{transport="sse"} %d\n' % len(ws_manager.sse_clients)
+        yield '# HELP ws_messages_total Push client messages by direction.\n'
+        yield '# TYPE ws_messages_total counter\n'
+        yield 'ws_messages_total{direction="in"} %d\n' % ws_manager.messages_received
+        yield 'ws_messages_total{direction="out"} %d\n' % ws_manager.messages_sent
+        total, largest = ws_manager.queue_depths()
+        yield '# HELP ws_send_queue_frames Frames waiting in the client send queues.\n'
+        yield '# TYPE ws_send_queue_frames gauge\n'
+        yield 'ws_send_queue_frames %d\n' % total
+        yield '# TYPE ws_send_queue_max_frames gauge\n'
+        yield 'ws_send_queue_max_frames %d\n' % largest
+        yield '# HELP ws_frames_coalesced_total Queued frames replaced by a newer frame for the same topic.\n'
+        yield '# TYPE ws_frames_coalesced_total counter\n'
+        yield 'ws_frames_coalesced_total %d\n' % ws_manager.frames_coalesced
+        yield '# HELP ws_frames_dropped_total Frames dropped because a client queue was full.\n'
+        yield '# TYPE ws_frames_dropped_total counter\n'
+        yield 'ws_frames_dropped_total %d\n' % ws_manager.frames_dropped
+        yield '# TYPE ws_clients_disconnected_total counter\n'
+        yield 'ws_clients_disconnected_total %d\n' % ws_manager.clients_disconnected
+        yield '# HELP ws_eq_updates_merged_total EQ updates merged into a later broadcast by the rate limit.\n'
+        yield '# TYPE ws_eq_updates_merged_total counter\n'
+        yield 'ws_eq_updates_merged_total %d\n' % ws_manager.eq_updates_merged
+        
+        # Audio controls
+        yield '# TYPE uart_commands_sent_total counter\n'
+        yield 'uart_commands_sent_total %d\n' % self.uart_service.commands_sent
+        yield '# HELP eq_updates_total EQ updates by control source.\n'
+        yield '# TYPE eq_updates_total counter\n'
+        for source, count in self.model.eq_processor.update_counts.items():
+            yield 'eq_updates_total{source="%s"} %d\n' % (source, count)
+        
+        # Runtime
+        if hasattr(gc, 'mem_free'):
+            yield '# TYPE heap_free_bytes gauge\n'
+            yield 'heap_free_bytes %d\n' % gc.mem_free()
+            yield '# TYPE heap_alloc_bytes gauge\n'
+            yield 'heap_alloc_bytes %d\n' % gc.mem_alloc()
+        yield '# HELP event_loop_lag_seconds Event loop wake-up delay, last probe.\n'
+        yield '# TYPE event_loop_lag_seconds gauge\n'
+        yield 'event_loop_lag_seconds %s\n' % _format_us(self.loop_lag_us)
+        yield '# HELP event_loop_lag_max_seconds Largest event loop lag since the previous scrape.\n'
+        yield '# TYPE event_loop_lag_max_seconds gauge\n'
+        yield 'event_loop_lag_max_seconds %s\n' % _format_us(self.loop_lag_max_us)
+        self.loop_lag_max_us = self.loop_lag_us
+
+def _format_us(us):
+    """Format a number of microseconds as seconds, without floats"""
+    return '%d.%06d' % (us // 1000000, us % 1000000)
@@ -3,6 +3,7 @@ Middleware utilities for request/response handling
 """
 from .utils import create_error_response
 from .logger import main_logger
+from array import array
 import utime
 
 class ErrorHandler:
@@ -44,6 +45,112 @@ class RequestLogger:
         path = request.path
         self.logger.info(f"{method} {path} - {status_code} ({duration}ms)")
 
+class RouteMetrics:
+    """Counters for a single route"""
+    
+    def __init__(self, bucket_count):
+        self.calls = 0
+        self.statuses = {}
+        # [sampled count, latency sum in s, remaining us of the sum,
+        #  one slot per bucket + overflow]
+        self.latency = array('L', [0] * (bucket_count + 4))
+
+class RequestMetrics:
+    """Middleware that records per-route counts, status codes and latency
+    histograms.
+    
+    Routes are keyed by their URL pattern, so dynamic segments do not create
+    new entries, and requests that match no route are recorded under None.
+    Latency is measured with ticks_us from the first before_request hook to
+    the last after_request hook. The counters are allocated once per route,
+    so recording a request only updates integers in place.
+    
+    On MicroPython integers from 2**30 up are allocated on the heap, so the
+    latency sum is kept as whole seconds plus the remaining microseconds,
+    both of which stay below that. The request and bucket counts grow by one
+    per request and only pass it after about a billion requests.
+    """
+    
+    # Upper bounds of the latency buckets in microseconds (log scale)
+    BUCKETS_US = (250, 500, 1000, 2500, 5000, 10000, 25000, 50000,
+                  100000, 250000, 500000, 1000000)
+    
+    def __init__(self, sample_every=1):
+        self.sample_every = sample_every
+        self.routes = {}
+        self.started = {}
+        self.counter = 0
+    
+    def set_sampling(self, sample_every):
+        """Time one in every sample_every requests, or disable metrics with 0.
+        Can be changed at runtime."""
+        self.sample_every = sample_every
+        if not sample_every:
+            self.started.clear()
+    
+    def register(self, app):
+        """Install the hooks on a Microdot application"""
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.after_error_request(self.after_request)
+    
+    def before_request(self, request):
+        """Start timing a sampled request"""
+        if self.sample_every:
+            self.counter += 1
+            if self.counter >= self.sample_every:
+                self.counter = 0
+                self.started[request] = utime.ticks_us()
+    
+    def after_request(self, request, response):
+        """Record the outcome of a request"""
+        if not self.sample_every:
+            return response
+        route = request.url_pattern if request else None
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = RouteMetrics(len(self.BUCKETS_US))
+        stats.calls += 1
+        status = response.status_code
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        start = self.started.pop(request, None)
+        if start is not None:
+            elapsed = utime.ticks_diff(utime.ticks_us(), start)
+            latency = stats.latency
+            latency[0] += 1
+            us = latency[2] + elapsed
+            if us >= 1000000:
+                latency[1] += us // 1000000
+                us %= 1000000
+            latency[2] = us
+            i = 0
+            for bound in self.BUCKETS_US:
+                if elapsed <= bound:
+                    break
+                i += 1
+            latency[i + 3] += 1
+        return response
+    
+    def reset(self):
+        """Clear all recorded metrics"""
+        self.routes = {}
+        self.started.clear()
+    
+    def get_stats(self):
+        """Return the recorded metrics as a dictionary"""
+        stats = {}
+        for route, metrics in self.routes.items():
+            latency = metrics.latency
+            stats[route or 'unmatched'] = {
+                'calls': metrics.calls,
+                'statuses': dict(metrics.statuses),
+                'sampled': latency[0],
+                'latency_sum_us': latency[1] * 1000000 + latency[2],
+                'buckets': list(zip(self.BUCKETS_US + (None,), latency[3:]))
+            }
+        return stats
+
 # Global middleware instances
 error_handler = ErrorHandler(None)
 request_logger = RequestLogger()
+request_metrics = RequestMetrics()
@@ -5,6 +5,8 @@ from ..utils import create_success_response, create_error_response, ValidationEr
 from model.utils import validate_uart_command
 from ..logger import api_logger
 from ..config import SERVER_NAME, VERSION
+from ..state_snapshots import StateSnapshots
+from lib.microdot import Response
 import utime
 
 class AudioRoutes:
@@ -14,6 +16,8 @@ class AudioRoutes:
         self.model = model
         self.uart_service = uart_service
         self.logger = api_logger
+        self.snapshots = StateSnapshots(model)
+        self.snapshots.add_view('state', self._build_current_state, binary=True)
     
     def toggle_voice_mode(self, request):
         """Toggle voice mode and return updated state"""
@@ -56,15 +60,18 @@ class AudioRoutes:
             return "Error: Failed to toggle mute"
     
     def get_current_state_json(self, request):
-        """Return current system state as JSON"""
+        """Return current system state as JSON, with the state version as ETag"""
         try:
-            return {
-                'mode': self.model.voice_mode_manager.current_mode,
-                'ducking': self.model.voice_mode_manager.ducking_enabled,
-                'feedback': self.model.voice_mode_manager.feedback_enabled,
-                'muted': self.model.voice_mode_manager.get_mute_status(),
-                'eq': self._get_eq_state()
+            version, data = self.snapshots.get('state')
+            headers = {
+                'Content-Type': 'application/json; charset=UTF-8',
+                'Content-Length': str(len(data)),
+                'ETag': self.snapshots.etag(version),
+                'Cache-Control': 'no-cache'
             }
+            if Response.not_modified(request, headers):
+                return Response(b'', 304, headers, reason='Not Modified')
+            return data, 200, headers
         except Exception as e:
             self.logger.exception("Failed to get current state", e)
             return create_error_response("Failed to get current state")
@@ -122,8 +129,7 @@ class AudioRoutes:
             import gc
             import micropython
             
-            # Get memory info
-            gc.collect()
+            # Get memory info (without forcing a collection, see /metrics)
             free_mem = gc.mem_free()
             allocated_mem = gc.mem_alloc()
             
@@ -176,6 +182,15 @@ class AudioRoutes:
             self.logger.exception("DSP mixer update failed", e)
             return create_error_response("Failed to update DSP mixer")
     
+    def _build_current_state(self):
+        return {
+            'mode': self.model.voice_mode_manager.current_mode,
+            'ducking': self.model.voice_mode_manager.ducking_enabled,
+            'feedback': self.model.voice_mode_manager.feedback_enabled,
+            'muted': self.model.voice_mode_manager.get_mute_status(),
+            'eq': self._get_eq_state()
+        }
+    
     def _get_eq_state(self):
         """Get current EQ state"""
         return {
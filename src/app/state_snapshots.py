@@ -0,0 +1,37 @@
+"""
+Cached serialized views of the model state
+"""
+import json
+import random
+
+class StateSnapshots:
+    """Serialized JSON views of the model state, keyed by the model's state
+    version. A view is rebuilt only when the state has changed since it was
+    last serialized.
+    """
+    
+    def __init__(self, model):
+        self.model = model
+        self.views = {}
+        # Distinguishes versions from before a restart in entity tags
+        self.epoch = random.getrandbits(24)
+    
+    def add_view(self, name, builder, binary=False):
+        """Register a view; builder returns the data to serialize. Binary views
+        are stored as bytes, the rest as str"""
+        # [builder, binary, version, serialized data]
+        self.views[name] = [builder, binary, None, None]
+    
+    def get(self, name):
+        """Return (version, serialized view) for the current state"""
+        view = self.views[name]
+        version = self.model.state_version
+        if view[2] != version:
+            data = json.dumps(view[0]())
+            view[3] = data.encode() if view[1] else data
+            view[2] = version
+        return version, view[3]
+    
+    def etag(self, version):
+        """Entity tag for a state version"""
+        return '"{:x}-{:x}"'.format(self.epoch, version)
@@ -6,12 +6,25 @@ from machine import UART, Pin
 class UARTService:
     def __init__(self, uart_id=0, baud_rate=115200, tx_pin=0, rx_pin=1):
         self.uart = UART(uart_id, baud_rate, tx=Pin(tx_pin), rx=Pin(rx_pin))
+        self.commands_sent = 0
+        # Set in dual-core mode: commands are queued and written from core 1
+        self.queue = None
+        self.commands_dropped = 0
         print("UART Controller Ready.")
 
     def send_command(self, param: str, value: float):
         """Formats and sends a DSP command over UART."""
+        if self.queue is not None:
+            if not self.queue.put((param, value)):
+                self.commands_dropped += 1
+            return
+        self.write_command(param, value)
+
+    def write_command(self, param: str, value: float):
+        """Writes a DSP command to the UART (on core 1 in dual-core mode)."""
         cmd = f"{param} {value}\n"
         self.uart.write(cmd)
+        self.commands_sent += 1
         print(f"Sent -> {cmd.strip()}")
 
     def deinit(self):
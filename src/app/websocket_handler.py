@@ -5,6 +5,7 @@ import json
 from .config import WS_MESSAGES
 from .utils import ValidationError, validate_eq_update
 from .logger import ws_logger
+from .state_snapshots import StateSnapshots
 from model.utils import validate_uart_command
 
 class WebSocketHandler:
@@ -12,6 +13,9 @@ class WebSocketHandler:
         self.model = model
         self.uart_service = uart_service
         self.logger = ws_logger
+        self.snapshots = StateSnapshots(model)
+        self.snapshots.add_view('initial_state', self._build_initial_state)
+        self.snapshots.add_view('current_state', self._build_current_state)
         self.handlers = {
             WS_MESSAGES['PING']: self._handle_ping,
             WS_MESSAGES['VOICE_MODE_TOGGLE']: self._handle_voice_mode_toggle,
@@ -21,6 +25,7 @@ class WebSocketHandler:
             WS_MESSAGES['FEEDBACK_TOGGLE']: self._handle_feedback_toggle,
             WS_MESSAGES['MUTE_TOGGLE']: self._handle_mute_toggle,
             WS_MESSAGES['GET_STATE']: self._handle_get_state,
+            WS_MESSAGES['RESYNC']: self._handle_resync,
             WS_MESSAGES['UART_COMMAND']: self._handle_uart_command,
         }
     
@@ -36,27 +41,59 @@ class WebSocketHandler:
         finally:
             self.model.ws_manager.remove_client(ws)
     
+    async def handle_sse_connection(self, sse):
+        """Handle Server-Sent Events connection lifecycle (server to client updates only)"""
+        manager = self.model.ws_manager
+        manager.add_sse_client(sse)
+        
+        try:
+            missed = manager.events_since(sse.last_event_id)
+            if missed is None:
+                # The snapshot includes every event so far, a client that
+                # reconnects with its ID resumes after it
+                await self._send_snapshot(sse, 'initial_state', event_id=manager.event_id)
+                self.logger.info("Sent initial state to SSE client")
+            else:
+                # Resume a reconnecting client from the last event it received
+                for event_id, message in missed:
+                    await sse.send(message, event_id=event_id)
+                manager.messages_sent += len(missed)
+                self.logger.info(f"Resumed SSE client with {len(missed)} missed events")
+            await sse.wait_closed()
+        finally:
+            manager.remove_sse_client(sse)
+    
     async def _send_initial_state(self, ws):
         """Send initial state to newly connected client"""
-        initial_state = {
-            'type': WS_MESSAGES['INITIAL_STATE'],
-            'mode': self.model.voice_mode_manager.current_mode,
-            'feedback': self.model.voice_mode_manager.feedback_enabled,
-            'ducking': self.model.voice_mode_manager.ducking_enabled,
-            'mute': self.model.voice_mode_manager.get_mute_status(),
-            'eq': self._get_eq_state(),
-            'uart': self.model.uart_manager.get_state(),
-        }
-        await ws.send(json.dumps(initial_state))
+        await self._send_snapshot(ws, 'initial_state')
         self.logger.info("Sent initial state to client")
     
+    async def _send_snapshot(self, ws, view, event_id=None):
+        """Send a state view tagged with the sequence number of the last delta it includes"""
+        _, state = self.snapshots.get(view)
+        # The cached JSON object is reused, the sequence number is prepended to it
+        data = '{"seq": %d, %s' % (self.model.ws_manager.seq, state[1:])
+        if event_id is None:
+            await self._send(ws, data)
+        else:
+            await ws.send(data, event_id=event_id)
+            self.model.ws_manager.messages_sent += 1
+    
     async def _message_loop(self, ws):
         """Main message processing loop"""
         while True:
             message = await ws.receive()
             if message:
+                self.model.ws_manager.messages_received += 1
                 await self._process_message(ws, message)
     
+    async def _send(self, ws, data):
+        """Send a message (a dict, or JSON text) to a single client"""
+        if not isinstance(data, str):
+            data = json.dumps(data)
+        await ws.send(data)
+        self.model.ws_manager.messages_sent += 1
+    
     async def _process_message(self, ws, message):
         """Process incoming WebSocket message"""
         try:
@@ -76,10 +113,10 @@ class WebSocketHandler:
     
     async def _handle_ping(self, ws, data):
         """Handle ping message"""
-        await ws.send(json.dumps({
+        await self._send(ws, {
             'type': WS_MESSAGES['PONG'],
             'timestamp': data.get('timestamp')
-        }))
+        })
     
     async def _handle_voice_mode_toggle(self, ws, data):
         """Handle voice mode toggle"""
@@ -173,14 +210,33 @@ class WebSocketHandler:
     
     async def _handle_get_state(self, ws, data):
         """Handle get current state request"""
-        state_data = {
+        _, state_data = self.snapshots.get('current_state')
+        await self._send(ws, state_data)
+        self.logger.info("Sent current state")
+    
+    async def _handle_resync(self, ws, data):
+        """Handle a client that missed a delta and needs the full state"""
+        await self._send_snapshot(ws, 'initial_state')
+        self.logger.info(f"Resynced client after seq {data.get('seq')}")
+    
+    def _build_initial_state(self):
+        return {
+            'type': WS_MESSAGES['INITIAL_STATE'],
+            'mode': self.model.voice_mode_manager.current_mode,
+            'feedback': self.model.voice_mode_manager.feedback_enabled,
+            'ducking': self.model.voice_mode_manager.ducking_enabled,
+            'mute': self.model.voice_mode_manager.get_mute_status(),
+            'eq': self._get_eq_state(),
+            'uart': self.model.uart_manager.get_state(),
+        }
+    
+    def _build_current_state(self):
+        return {
             'type': WS_MESSAGES['INITIAL_STATE'],
             'mode': self.model.voice_mode_manager.current_mode,
             'eq': self._get_eq_state(),
             'uart': self.model.uart_manager.get_state(),
         }
-        await ws.send(json.dumps(state_data))
-        self.logger.info("Sent current state")
     
     def _get_eq_state(self):
         """Get current EQ state"""
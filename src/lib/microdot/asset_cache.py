@@ -0,0 +1,136 @@
+"""
+asset_cache
+-----------
+
+The ``asset_cache`` module implements an in-memory cache for static files
+served with :func:`send_file <microdot.Response.send_file>`.
+"""
+import os
+from collections import OrderedDict
+
+
+class AssetCache:
+    """An LRU cache that keeps the contents of static files in memory.
+
+    :param max_size: The maximum number of bytes that can be stored in the
+                     cache. When adding a file would exceed this size, the
+                     least recently used files are evicted.
+    :param max_item_size: The largest file size that is cached. Larger files
+                          are always read from the filesystem. If omitted,
+                          half of ``max_size`` is used.
+
+    Each file is stored with a version, such as its size and modification
+    time, given by the caller. A file that is requested with a different
+    version than the one it was stored with is loaded again, so that changes
+    to files on disk are picked up.
+
+    To enable the cache, assign an instance to the
+    :attr:`Response.send_file_cache <microdot.Response.send_file_cache>`
+    attribute::
+
+        from microdot import Response
+        from microdot.asset_cache import AssetCache
+
+        Response.send_file_cache = AssetCache(max_size=32 * 1024)
+    """
+    def __init__(self, max_size=32 * 1024, max_item_size=None):
+        self.max_size = max_size
+        self.max_item_size = max_item_size or max_size // 2
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path, version=None):
+        """Return the cached contents of a file, or ``None`` if the file is
+        not in the cache.
+
+        :param path: The path of the file.
+        :param version: The current version of the file. If the file was
+                        stored with a different version, it is removed from
+                        the cache and ``None`` is returned.
+        """
+        entry = self.entries.pop(path, None)
+        if entry is None:
+            return None
+        if entry[0] != version:
+            # the file has changed since it was cached
+            self.size -= len(entry[1])
+            self.invalidations += 1
+            return None
+        # re-insert the entry to mark it as the most recently used
+        self.entries[path] = entry
+        return entry[1]
+
+    def put(self, path, data, version=None):
+        """Store the contents of a file in the cache. Returns ``True`` if the
+        data was stored, or ``False`` if it is too large to be cached.
+
+        :param path: The path of the file.
+        :param data: The contents of the file, as bytes.
+        :param version: The version of the file the data was read from.
+        """
+        if len(data) > self.max_item_size or len(data) > self.max_size:
+            return False
+        self.remove(path)
+        while self.entries and self.size + len(data) > self.max_size:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.evictions += 1
+        self.entries[path] = (version, data)
+        self.size += len(data)
+        return True
+
+    def remove(self, path):
+        """Remove a file from the cache.
+
+        :param path: The path of the file.
+        """
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        """Remove all the files from the cache."""
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def fetch(self, path, version=None):
+        """Return the contents of a file from the cache, loading it from the
+        filesystem if necessary. Returns ``None`` if the file is too large to
+        be cached, in which case the caller should stream it from the
+        filesystem.
+
+        :param path: The path of the file.
+        :param version: The current version of the file, for example a
+                        ``(size, mtime)`` tuple from ``os.stat()``, or its
+                        entity tag.
+        """
+        data = self.get(path, version)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        if os.stat(path)[6] > self.max_item_size:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except MemoryError:  # pragma: no cover
+            return None
+        self.put(path, data, version)
+        return data
+
+    def stats(self):
+        """Return a dictionary with the cache counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self.entries),
+            'size': self.size,
+            'max_size': self.max_size,
+        }
@@ -0,0 +1,136 @@
+"""
+asset_manifest
+--------------
+
+The ``asset_manifest`` module serves static files that are described by a
+manifest generated at build time, so that answering a request for them does
+not require inspecting the filesystem.
+"""
+import json
+from microdot import Response
+
+
+class Asset:
+    """A static file listed in an asset manifest.
+
+    :param path: The path of the file to send.
+    :param size: The size of the file in bytes.
+    :param etag: The ``ETag`` header of the file.
+    :param content_type: The ``Content-Type`` header of the file.
+    :param encoding: The ``Content-Encoding`` of the file, or ``None`` if it
+                     is not compressed.
+    :param max_age: The ``Cache-Control`` header's ``max-age`` value, or
+                    ``None`` to omit this header.
+    :param headers: The remaining response headers, formatted as header
+                    lines that end in ``\\r\\n``.
+    """
+    def __init__(self, path, size, etag, content_type, encoding=None,
+                 max_age=None, headers=''):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.content_type = content_type
+        self.encoding = encoding
+        self.max_age = max_age
+        # the headers that the server inspects are kept in a dictionary, the
+        # rest are written to the client as given
+        self.headers = {'Content-Type': content_type,
+                        'Content-Length': str(size)}
+        self.validators = {'ETag': etag}
+        self.raw_headers = headers.encode()
+
+
+class AssetManifest:
+    """A table of static files, indexed by URL.
+
+    :param assets: A dictionary that maps URLs to :class:`Asset` instances.
+
+    The manifest is usually loaded at startup from a JSON file with
+    :meth:`load`, and then used in the routes that serve static files::
+
+        from microdot.asset_manifest import AssetManifest
+
+        manifest = AssetManifest.load('asset-manifest.json')
+
+        @app.route('/static/<path:path>')
+        async def static(request, path):
+            return manifest.send_asset(request.path, request) or 404
+
+    The JSON file has an object with a key for each URL. The values are
+    objects with ``file``, ``size``, ``etag`` and ``content_type`` keys, and
+    optionally ``encoding``, ``max_age`` and ``headers``, the latter with the
+    remaining headers already formatted.
+    """
+    def __init__(self, assets=None):
+        self.assets = assets or {}
+
+    @classmethod
+    def load(cls, filename):
+        """Load a manifest from a JSON file.
+
+        :param filename: The path of the manifest file.
+
+        ``OSError`` is raised if the file cannot be read, and ``ValueError``
+        or ``KeyError`` if its contents are not a valid manifest.
+        """
+        with open(filename) as f:
+            entries = json.load(f)
+        if not isinstance(entries, dict):
+            raise ValueError('invalid asset manifest')
+        assets = {}
+        for url, entry in entries.items():
+            if not isinstance(entry, dict):
+                raise ValueError('invalid asset manifest entry')
+            assets[url] = Asset(entry['file'], entry['size'], entry['etag'],
+                                entry['content_type'], entry.get('encoding'),
+                                entry.get('max_age'), entry.get('headers', ''))
+        return cls(assets)
+
+    def get(self, url):
+        """Return the :class:`Asset` for a URL, or ``None`` if the URL is not
+        in the manifest.
+
+        :param url: The URL path of the asset.
+        """
+        return self.assets.get(url)
+
+    def send_asset(self, url, request=None):
+        """Return a response with the asset for a URL, or ``None`` if the URL
+        is not in the manifest.
+
+        :param url: The URL path of the asset.
+        :param request: The request that is being answered. If given, a
+                        response with a 304 status code is returned when the
+                        client's cached copy is still valid.
+
+        Requests that need the file to be processed, such as range requests
+        and requests from clients that do not accept the encoding of the
+        file, are passed on to
+        :meth:`Response.send_file() <microdot.Response.send_file>`.
+        """
+        asset = self.assets.get(url)
+        if asset is None:
+            return None
+        if request is not None:
+            if (asset.encoding and not Response.accepts_encoding(
+                    request, asset.encoding)) or 'Range' in request.headers:
+                return Response.send_file(
+                    asset.path, content_type=asset.content_type,
+                    max_age=asset.max_age, compressed=asset.encoding or False,
+                    etag=asset.etag, request=request)
+            if Response.not_modified(request, asset.validators):
+                res = Response(body=b'', status_code=304,
+                               headers=asset.headers, reason='Not Modified')
+                res.raw_headers = asset.raw_headers
+                return res
+        body = None
+        if request is not None and request.method == 'HEAD':
+            # the body is not sent, so the file does not need to be opened
+            body = b''
+        elif Response.send_file_cache is not None:
+            body = Response.send_file_cache.fetch(asset.path, asset.etag)
+        if body is None:
+            body = open(asset.path, 'rb')
+        res = Response(body=body, headers=asset.headers)
+        res.raw_headers = asset.raw_headers
+        return res
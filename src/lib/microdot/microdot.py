@@ -6,8 +6,11 @@ The ``microdot`` module defines a few classes that help implement HTTP-based
 servers for MicroPython and standard Python.
 """
 import asyncio
+import gc
 import io
+import os
 import re
+import sys
 import time
 
 try:
@@ -45,6 +48,11 @@ except ImportError:  # pragma: no cover
             ret = await ret
         return ret
 
+try:
+    import deflate
+except ImportError:  # pragma: no cover
+    deflate = None
+
 try:
     from sys import print_exception
 except ImportError:  # pragma: no cover
@@ -59,6 +67,24 @@ MUTED_SOCKET_ERRORS = [
     104,  # Connection reset by peer
     128,  # Operation on closed socket
 ]
+ETIMEDOUT = 110  # Connection timed out
+
+# CPython transports keep a reference to the data they cannot send right
+# away, so a buffer that is going to be reused has to be copied when it is
+# written. MicroPython streams have finished with the data when the write
+# returns.
+COPY_BUFFER_WRITES = sys.implementation.name != 'micropython'
+
+
+async def with_timeout(coro, timeout):
+    """Await a coroutine, cancelling it if it does not complete in the given
+    number of seconds. If ``timeout`` is ``None`` or 0, no timeout is applied.
+
+    This function is a coroutine.
+    """
+    if not timeout:
+        return await coro
+    return await asyncio.wait_for(coro, timeout)
 
 
 def urldecode(s):
@@ -106,8 +132,13 @@ class NoCaseDict(dict):
         {}
     """
     def __init__(self, initial_dict=None):
-        super().__init__(initial_dict or {})
-        self.keymap = {k.lower(): k for k in self.keys() if k.lower() != k}
+        if initial_dict:
+            super().__init__(initial_dict)
+            self.keymap = {k.lower(): k for k in self.keys()
+                           if k.lower() != k}
+        else:
+            super().__init__()
+            self.keymap = {}
 
     def __setitem__(self, key, value):
         kl = key.lower()
@@ -137,6 +168,115 @@ class NoCaseDict(dict):
             self[key] = value
 
 
+class RequestHeaders(NoCaseDict):
+    """A case-insensitive dictionary of request headers that decodes header
+    lines on demand.
+
+    :param lines: a list with the raw header lines, as received from the
+                  client.
+
+    The header lines are kept as bytes until a header is accessed, at which
+    point only the line for that header is decoded. Operations that need all
+    the headers, such as ``items()``, ``copy()`` or iteration, decode all the
+    lines that are still pending.
+    """
+    def __init__(self, lines=None):
+        super().__init__()
+        # pending lines, indexed by their lowercase header name, as bytes
+        self.pending = {}
+        for line in lines or []:
+            n = line.find(b':')
+            if n < 0:
+                raise ValueError('invalid header')
+            self.pending[line[:n].lower()] = line
+
+    def load(self, key):
+        """Decode the pending line for the given header.
+
+        :param key: the header name, in lowercase.
+        """
+        line = self.pending.pop(key.encode(), None)
+        if line is not None:
+            n = len(key)
+            NoCaseDict.__setitem__(self, line[:n].decode(),
+                                   line[n + 1:].strip().decode())
+
+    def load_all(self):
+        """Decode all the pending header lines."""
+        while self.pending:
+            self.load(next(iter(self.pending)).decode())
+
+    def __setitem__(self, key, value):
+        if self.pending:
+            self.load(key.lower())
+        super().__setitem__(key, value)
+
+    def __getitem__(self, key):
+        kl = key.lower()
+        if self.pending:
+            self.load(kl)
+        return dict.__getitem__(self, self.keymap.get(kl, kl))
+
+    def __delitem__(self, key):
+        if self.pending:
+            self.load(key.lower())
+        super().__delitem__(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        self.load_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        self.load_all()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        kl = key.lower()
+        if self.pending and kl.encode() in self.pending:
+            self.load(kl)
+        return dict.get(self, self.keymap.get(kl, kl), default)
+
+    def pop(self, key, *default):
+        kl = key.lower()
+        if self.pending:
+            self.load(kl)
+        return dict.pop(self, self.keymap.pop(kl, kl), *default)
+
+    def setdefault(self, key, default=None):
+        value = self.get(key)
+        if value is None:
+            self[key] = value = default
+        return value
+
+    def copy(self):
+        self.load_all()
+        return NoCaseDict(dict(self.items()))
+
+    def keys(self):
+        self.load_all()
+        return super().keys()
+
+    def values(self):
+        self.load_all()
+        return super().values()
+
+    def items(self):
+        self.load_all()
+        return super().items()
+
+
 def mro(cls):  # pragma: no cover
     """Return the method resolution order of a class.
 
@@ -188,6 +328,11 @@ class MultiDict(dict):
         >>> print(d.getlist('sort'))
         ['name', 'email']
     """
+    class Values(list):
+        """The values of a key that was assigned more than once. Keys that
+        have a single value store it directly, without a list."""
+        pass
+
     def __init__(self, initial_dict=None):
         super().__init__()
         if initial_dict:
@@ -196,11 +341,19 @@ class MultiDict(dict):
 
     def __setitem__(self, key, value):
         if key not in self:
-            super().__setitem__(key, [])
-        super().__getitem__(key).append(value)
+            super().__setitem__(key, value)
+            return
+        values = super().__getitem__(key)
+        if not isinstance(values, MultiDict.Values):
+            values = MultiDict.Values((values,))
+            super().__setitem__(key, values)
+        values.append(value)
 
     def __getitem__(self, key):
-        return super().__getitem__(key)[0]
+        values = super().__getitem__(key)
+        if isinstance(values, MultiDict.Values):
+            return values[0]
+        return values
 
     def get(self, key, default=None, type=None):
         """Return the value for a given key.
@@ -256,6 +409,8 @@ class MultiDict(dict):
         if key not in self:
             return []
         values = super().__getitem__(key)
+        if not isinstance(values, MultiDict.Values):
+            values = [values]
         if type is not None:
             values = [type(value) for value in values]
         return values
@@ -285,6 +440,263 @@ class AsyncBytesIO:
         pass
 
 
+class TimeoutStream:
+    """An input stream that limits the time each read can take.
+
+    :param stream: The input stream to read from.
+    :param timeout: The number of seconds each read can take.
+    :param app: The application, which counts the connection in its
+                ``reaped_connections`` when a read times out.
+
+    A read that takes longer than ``timeout`` aborts the request with a 408
+    status code, so that a client that trickles its request body cannot hold
+    the connection forever.
+    """
+    def __init__(self, stream, timeout, app=None):
+        self.stream = stream
+        self.timeout = timeout
+        self.app = app
+
+    async def _timed(self, coro):
+        try:
+            return await with_timeout(coro, self.timeout)
+        except asyncio.TimeoutError:
+            if self.app is not None:
+                self.app.reaped_connections += 1
+            raise HTTPException(408, 'Request timeout')
+
+    async def read(self, n=-1):
+        return await self._timed(self.stream.read(n))
+
+    async def readline(self):
+        return await self._timed(self.stream.readline())
+
+    async def readexactly(self, n):
+        return await self._timed(self.stream.readexactly(n))
+
+    async def readuntil(self, separator=b'\n'):
+        return await self._timed(self.stream.readuntil(separator))
+
+
+class ChunkedStream:
+    """An input stream that decodes a request body sent with the
+    ``chunked`` transfer encoding.
+
+    :param stream: The input stream from where the encoded body is read.
+    :param max_length: The maximum length of the decoded body, or ``None``
+                       for no limit. A chunk that would take the body over
+                       this length aborts the request with a 413 status code
+                       before it is read.
+
+    Data is returned as it arrives, without waiting for complete chunks, so
+    the amount of memory used is given by the sizes requested by the caller.
+    """
+    def __init__(self, stream, max_length=None):
+        self.stream = stream
+        self.max_length = max_length
+        self.length = 0
+        self.remaining = 0
+        self.eof = False
+
+    async def read(self, n=-1):
+        if n < 0:
+            data = b''
+            while True:
+                chunk = await self.read(Request.max_readline)
+                if not chunk:
+                    return data
+                data += chunk
+        if n == 0:
+            return b''
+        if not self.remaining:
+            if self.eof:
+                return b''
+            await self._next_chunk()
+            if self.eof:
+                return b''
+        data = await self.stream.read(min(n, self.remaining))
+        if not data:
+            raise EOFError('incomplete chunk')
+        self.remaining -= len(data)
+        if not self.remaining:
+            # discard the line break at the end of the chunk
+            await self.stream.readexactly(2)
+        return data
+
+    async def readexactly(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = await self.read(n - len(data))
+            if not chunk:
+                raise EOFError('incomplete body')
+            data += chunk
+        return data
+
+    async def _next_chunk(self):
+        line = await Request._safe_readline(self.stream)
+        size = int(line.split(b';', 1)[0].strip(), 16)
+        self.length += size
+        if self.max_length is not None and self.length > self.max_length:
+            raise HTTPException(413, 'Payload too large')
+        if size == 0:
+            # skip the trailer fields, if any
+            while (await Request._safe_readline(self.stream)).strip():
+                pass
+            self.eof = True
+        self.remaining = size
+
+
+class DecompressedStream:
+    """A file-like object that decompresses a gzip or zlib stream as it is
+    read.
+
+    :param stream: The compressed file-like object. It is closed when this
+                   object is closed.
+    :param encoding: The content coding of the stream, ``'gzip'`` or
+                     ``'deflate'``.
+
+    On MicroPython the ``deflate`` module is used directly. This class is
+    only used when that module is not available.
+    """
+    def __init__(self, stream, encoding):
+        import zlib
+        self.stream = stream
+        self.decompressor = zlib.decompressobj(
+            31 if encoding == 'gzip' else 15)
+        self.pending = b''
+
+    def read(self, n=-1):
+        while n < 0 or len(self.pending) < n:
+            data = self.stream.read(1024)
+            if not data:
+                self.pending += self.decompressor.flush()
+                break
+            self.pending += self.decompressor.decompress(data)
+        if n < 0:
+            n = len(self.pending)
+        data, self.pending = self.pending[:n], self.pending[n:]
+        return data
+
+    def close(self):
+        self.stream.close()
+
+
+def decompress_stream(stream, encoding):
+    """Return a file-like object that decompresses the given stream.
+
+    :param stream: The compressed file-like object.
+    :param encoding: The content coding of the stream, ``'gzip'`` or
+                     ``'deflate'``.
+    """
+    if deflate is not None:  # pragma: no cover
+        return deflate.DeflateIO(
+            stream, deflate.GZIP if encoding == 'gzip' else deflate.ZLIB, 0,
+            True)
+    return DecompressedStream(stream, encoding)
+
+
+class FileRange:
+    """A file-like object that reads a limited number of bytes from a file.
+
+    :param stream: The file-like object, positioned at the first byte to
+                   read. It is closed when this object is closed.
+    :param length: The number of bytes to read.
+    """
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def readinto(self, buf):
+        if self.remaining <= 0:
+            return 0
+        if len(buf) > self.remaining:
+            buf = memoryview(buf)[:self.remaining]
+        n = self.stream.readinto(buf)
+        if n:
+            self.remaining -= n
+        return n
+
+    def close(self):
+        self.stream.close()
+
+
+class BufferedStream:
+    """A write buffer that coalesces small writes to an output stream.
+
+    :param stream: The output stream to write to.
+    :param size: The size of the buffer, in bytes.
+    :param timeout: The number of seconds each write to the stream can take
+                    before it is abandoned with an ``OSError`` with errno
+                    ``ETIMEDOUT``, or ``None`` to wait indefinitely.
+
+    Data is copied into a buffer that is allocated once, and the buffer is
+    written to the stream only when it is full or when :meth:`flush` is
+    called. This allows the status line, the headers and a small body to be
+    sent in a single write. Data that is larger than the buffer is written
+    to the stream directly after the buffer is filled and flushed. On
+    CPython the buffer is copied each time it is flushed, because the
+    transport may still reference it after the write returns.
+    """
+    def __init__(self, stream, size, timeout=None):
+        self.stream = stream
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.used = 0
+        self.timeout = timeout
+
+    async def _write(self, data):
+        try:
+            await with_timeout(self.stream.awrite(data), self.timeout)
+        except asyncio.TimeoutError:
+            raise OSError(ETIMEDOUT, 'write timed out')
+
+    async def awrite(self, data):
+        size = len(self.buffer)
+        n = len(data)
+        if self.used + n <= size:
+            self.view[self.used:self.used + n] = data
+            self.used += n
+            return
+        data = memoryview(data)
+        free = size - self.used
+        self.view[self.used:] = data[:free]
+        self.used = size
+        await self.flush()
+        data = data[free:]
+        if len(data) >= size:
+            await self._write(data)
+        else:
+            self.view[:len(data)] = data
+            self.used = len(data)
+
+    async def awrite_file(self, f):
+        """Copy the contents of a file-like object to the stream.
+
+        :param f: The file-like object, which must implement ``readinto()``.
+
+        The file is read directly into the free space of the buffer, so no
+        memory is allocated for each chunk that is read.
+        """
+        size = len(self.buffer)
+        while True:
+            n = f.readinto(self.view[self.used:] if self.used else self.buffer)
+            if iscoroutine(n):  # pragma: no cover
+                n = await n
+            if not n:
+                break
+            self.used += n
+            if self.used == size:
+                await self.flush()
+
+    async def flush(self):
+        if self.used:
+            data = self.view[:self.used]
+            if COPY_BUFFER_WRITES:
+                data = bytes(data)
+            await self._write(data)
+            self.used = 0
+
+
 class Request:
     """An HTTP request."""
     #: Specify the maximum payload size that is accepted. Requests with larger
@@ -316,6 +728,16 @@ class Request:
     #:    Request.max_readline = 16 * 1024  # 16KB lines allowed
     max_readline = 2 * 1024
 
+    # __dict__ is included so that applications can still set their own
+    # attributes on the request, although ``g`` is the preferred place to
+    # store them
+    __slots__ = ('app', 'client_addr', 'method', 'url', 'url_prefix',
+                 'subapp', 'path', 'query_string', 'args', 'headers',
+                 'content_length', 'content_type', 'http_version',
+                 'url_args', 'url_pattern', '_g', '_body', 'body_used',
+                 '_stream', 'sock', '_cookies', '_json', '_form', '_files',
+                 'after_request_handlers', 'connection_slot', '__dict__')
+
     class G:
         pass
 
@@ -345,41 +767,43 @@ class Request:
         self.args = {}
         #: A dictionary with the headers included in the request.
         self.headers = headers
-        #: A dictionary with the cookies included in the request.
-        self.cookies = {}
         #: The parsed ``Content-Length`` header.
         self.content_length = 0
         #: The parsed ``Content-Type`` header.
         self.content_type = None
-        #: A general purpose container for applications to store data during
-        #: the life of the request.
-        self.g = Request.G()
+        #: The arguments parsed from the dynamic segments of the URL.
+        self.url_args = None
+        #: The URL pattern of the route that matched the request, or ``None``
+        #: if no route matched.
+        self.url_pattern = None
+        self._g = None
 
         self.http_version = http_version
         if '?' in self.path:
             self.path, self.query_string = self.path.split('?', 1)
             self.args = self._parse_urlencoded(self.query_string)
 
-        if 'Content-Length' in self.headers:
-            self.content_length = int(self.headers['Content-Length'])
-        if 'Content-Type' in self.headers:
-            self.content_type = self.headers['Content-Type']
-        if 'Cookie' in self.headers:
-            for cookie in self.headers['Cookie'].split(';'):
-                name, value = cookie.strip().split('=', 1)
-                self.cookies[name] = value
+        content_length = self.headers.get('Content-Length')
+        if content_length is not None:
+            self.content_length = int(content_length)
+        self.content_type = self.headers.get('Content-Type')
 
         self._body = body
         self.body_used = False
         self._stream = stream
         self.sock = sock
+        self._cookies = None
         self._json = None
         self._form = None
         self._files = None
-        self.after_request_handlers = []
+        # replaced with a list when the first handler is registered
+        self.after_request_handlers = ()
+        #: ``True`` while the request holds a slot of the connection limit.
+        self.connection_slot = False
 
     @staticmethod
-    async def create(app, client_reader, client_writer, client_addr):
+    async def create(app, client_reader, client_writer, client_addr,
+                     line=None):
         """Create a request object.
 
         :param app: The Microdot application instance.
@@ -388,39 +812,46 @@ class Request:
         :param client_writer: An output stream where the response data can be
                               written.
         :param client_addr: The address of the client, as a tuple.
+        :param line: The request line, if it was already read from
+                     ``client_reader``.
 
         This method is a coroutine. It returns a newly created ``Request``
         object.
         """
-        # request line
-        line = (await Request._safe_readline(client_reader)).strip().decode()
-        if not line:  # pragma: no cover
+        # request line and headers
+        head = await with_timeout(Request._read_head(client_reader, line),
+                                  app.header_timeout)
+        if head is None:  # pragma: no cover
             return None
+        line, lines = head
         method, url, http_version = line.split()
-        http_version = http_version.split('/', 1)[1]
+        if not http_version.startswith(b'HTTP/'):
+            raise ValueError('invalid request line')
+        method = method.decode()
+        url = url.decode()
+        http_version = '1.1' if http_version == b'HTTP/1.1' \
+            else http_version[5:].decode()
 
-        # headers
-        headers = NoCaseDict()
-        content_length = 0
-        while True:
-            line = (await Request._safe_readline(
-                client_reader)).strip().decode()
-            if line == '':
-                break
-            header, value = line.split(':', 1)
-            value = value.strip()
-            headers[header] = value
-            if header.lower() == 'content-length':
-                content_length = int(value)
+        # headers (only kept as raw lines here, they are decoded on access)
+        headers = RequestHeaders(lines)
+        content_length = int(headers.get('Content-Length', 0))
 
         # body
         body = b''
-        if content_length and content_length <= Request.max_body_length:
-            body = await client_reader.readexactly(content_length)
+        body_reader = client_reader
+        if app.body_timeout:
+            # bodies that the application reads as a stream are limited on
+            # each read
+            body_reader = TimeoutStream(client_reader, app.body_timeout, app)
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            stream = ChunkedStream(body_reader, Request.max_content_length)
+        elif content_length and content_length <= Request.max_body_length:
+            body = await with_timeout(
+                client_reader.readexactly(content_length), app.body_timeout)
             stream = None
         else:
             body = b''
-            stream = client_reader
+            stream = body_reader
 
         return Request(app, client_addr, method, url, http_version, headers,
                        body=body, stream=stream,
@@ -441,6 +872,26 @@ class Request:
                         if len(kv) > 1 else b''
         return data
 
+    @property
+    def g(self):
+        """A general purpose container for applications to store data during
+        the life of the request."""
+        if self._g is None:
+            self._g = Request.G()
+        return self._g
+
+    @property
+    def cookies(self):
+        """A dictionary with the cookies included in the request."""
+        if self._cookies is None:
+            self._cookies = {}
+            cookie_header = self.headers.get('Cookie')
+            if cookie_header:
+                for cookie in cookie_header.split(';'):
+                    name, value = cookie.strip().split('=', 1)
+                    self._cookies[name] = value
+        return self._cookies
+
     @property
     def body(self):
         """The body of the request, as bytes."""
@@ -519,9 +970,27 @@ class Request:
         Note that the function is not called if the request handler raises an
         exception and an error response is returned instead.
         """
+        if not self.after_request_handlers:
+            self.after_request_handlers = []
         self.after_request_handlers.append(f)
         return f
 
+    @staticmethod
+    async def _read_head(stream, line=None):
+        if line is None:
+            line = await Request._safe_readline(stream)
+        elif len(line) > Request.max_readline:
+            raise ValueError('line too long')
+        if not line.strip():  # pragma: no cover
+            return None
+        lines = []
+        while True:
+            header = await Request._safe_readline(stream)
+            if header in (b'\r\n', b'\n', b''):
+                break
+            lines.append(header)
+        return line, lines
+
     @staticmethod
     async def _safe_readline(stream):
         line = (await stream.readline())
@@ -556,6 +1025,9 @@ class Response:
         'txt': 'text/plain',
     }
 
+    #: The size of the buffer used to send responses, in bytes. File bodies
+    #: are read and sent in chunks of this size. The size can be changed for
+    #: a single response by setting its ``buffer_size`` attribute.
     send_file_buffer_size = 1024
 
     #: The content type to use for responses that do not explicitly define a
@@ -566,16 +1038,26 @@ class Response:
     #: of ``None`` means that no ``Cache-Control`` header is added.
     default_send_file_max_age = None
 
+    #: An optional cache for the contents of files served with
+    #: :meth:`send_file`, such as an
+    #: :class:`AssetCache <microdot.asset_cache.AssetCache>` instance. When
+    #: set, files that fit in the cache are served from memory instead of
+    #: being read from the filesystem on every request.
+    send_file_cache = None
+
     #: Special response used to signal that a response does not need to be
     #: written to the client. Used to exit WebSocket connections cleanly.
     already_handled = None
 
+    __slots__ = ('status_code', 'headers', 'reason', 'body', 'is_head',
+                 'http_version', 'chunked', 'buffer_size', 'raw_headers')
+
     def __init__(self, body='', status_code=200, headers=None, reason=None):
         if body is None and status_code == 200:
             body = ''
             status_code = 204
         self.status_code = status_code
-        self.headers = NoCaseDict(headers or {})
+        self.headers = NoCaseDict(headers)
         self.reason = reason
         if isinstance(body, (dict, list)):
             body = json.dumps(body)
@@ -586,6 +1068,11 @@ class Response:
             # this applies to bytes, file-like objects or generators
             self.body = body
         self.is_head = False
+        self.http_version = '1.0'
+        self.chunked = False
+        self.buffer_size = None
+        # pre-formatted header lines, written as-is after the headers
+        self.raw_headers = None
 
     def set_cookie(self, cookie, value, path=None, domain=None, expires=None,
                    max_age=None, secure=False, http_only=False,
@@ -646,15 +1133,39 @@ class Response:
             if 'charset=' not in self.headers['Content-Type']:
                 self.headers['Content-Type'] += '; charset=UTF-8'
 
-    async def write(self, stream):
+    def use_chunked_encoding(self):
+        """Send the body with the ``chunked`` transfer encoding if its length
+        is not known in advance. Returns ``True`` if the response is going to
+        be sent chunked.
+
+        The chunked encoding allows the client to find the end of a streamed
+        body without the server closing the connection, but it is only
+        understood by HTTP/1.1 clients.
+        """
         self.complete()
+        if self.is_head or self.body == b'' or \
+                'Content-Length' in self.headers or \
+                'Transfer-Encoding' in self.headers or \
+                self.status_code == 204 or self.status_code == 304:
+            return False
+        self.headers['Transfer-Encoding'] = 'chunked'
+        self.http_version = '1.1'
+        self.chunked = True
+        return True
+
+    async def write(self, stream, timeout=None):
+        self.complete()
+        stream = BufferedStream(
+            stream, self.buffer_size or self.send_file_buffer_size, timeout)
 
         try:
             # status code
             reason = self.reason if self.reason is not None else \
                 ('OK' if self.status_code == 200 else 'N/A')
-            await stream.awrite('HTTP/1.0 {status_code} {reason}\r\n'.format(
-                status_code=self.status_code, reason=reason).encode())
+            await stream.awrite('HTTP/{version} {status_code} {reason}\r\n'
+                                .format(version=self.http_version,
+                                        status_code=self.status_code,
+                                        reason=reason).encode())
 
             # headers
             for header, value in self.headers.items():
@@ -662,24 +1173,49 @@ class Response:
                 for value in values:
                     await stream.awrite('{header}: {value}\r\n'.format(
                         header=header, value=value).encode())
+            if self.raw_headers:
+                await stream.awrite(self.raw_headers)
             await stream.awrite(b'\r\n')
 
             # body
-            if not self.is_head:
+            if not self.is_head and hasattr(self.body, 'readinto') and \
+                    not self.chunked:
+                try:
+                    await stream.awrite_file(self.body)
+                finally:
+                    result = self.body.close()
+                    if iscoroutine(result):  # pragma: no cover
+                        await result
+            elif not self.is_head:
+                # async generators can wait between items, so their output
+                # is flushed as it is produced instead of being held back
+                flush_items = hasattr(self.body, '__anext__')
                 iter = self.body_iter()
                 async for body in iter:
                     if isinstance(body, str):  # pragma: no cover
                         body = body.encode()
+                    if self.chunked:
+                        if not body:
+                            # an empty chunk would end the body
+                            continue
+                        await stream.awrite('{:x}\r\n'.format(
+                            len(body)).encode())
                     try:
                         await stream.awrite(body)
-                    except OSError as exc:  # pragma: no cover
-                        if exc.errno in MUTED_SOCKET_ERRORS or \
-                                exc.args[0] == 'Connection lost':
-                            if hasattr(iter, 'aclose'):
-                                await iter.aclose()
+                        if self.chunked:
+                            await stream.awrite(b'\r\n')
+                        if flush_items:
+                            await stream.flush()
+                    except OSError:  # pragma: no cover
+                        # release the body, as it will not be iterated again
+                        if hasattr(iter, 'aclose'):
+                            await iter.aclose()
                         raise
                 if hasattr(iter, 'aclose'):  # pragma: no branch
                     await iter.aclose()
+                if self.chunked:
+                    await stream.awrite(b'0\r\n\r\n')
+            await stream.flush()
 
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS or \
@@ -727,10 +1263,11 @@ class Response:
                     except StopIteration:
                         await self.aclose()
                         raise StopAsyncIteration
-                buf = response.body.read(response.send_file_buffer_size)
+                size = response.buffer_size or response.send_file_buffer_size
+                buf = response.body.read(size)
                 if iscoroutine(buf):  # pragma: no cover
                     buf = await buf
-                if len(buf) < response.send_file_buffer_size:
+                if len(buf) < size:
                     self.i = self.ITER_NO_BODY
                 return buf
 
@@ -757,7 +1294,8 @@ class Response:
     @classmethod
     def send_file(cls, filename, status_code=200, content_type=None,
                   stream=None, max_age=None, compressed=False,
-                  file_extension=''):
+                  file_extension='', etag=None, request=None,
+                  buffer_size=None):
         """Send file contents in a response.
 
         :param filename: The filename of the file.
@@ -778,12 +1316,29 @@ class Response:
                            ``Content-Encoding`` header is set to ``gzip``. A
                            string with the header value can also be passed.
                            Note that when using this option the file must have
-                           been compressed beforehand. This option only sets
-                           the header.
+                           been compressed beforehand. When a ``request`` is
+                           given and its ``Accept-Encoding`` header does not
+                           accept this coding, the uncompressed file is sent
+                           if it exists, or else a ``gzip`` or ``deflate``
+                           file is decompressed while it is sent.
         :param file_extension: A file extension to append to the ``filename``
                                parameter when opening the file, including the
                                dot. The extension given here is not considered
                                when generating the ``Content-Type`` header.
+        :param etag: The ``ETag`` header to use in the response, for example
+                     a hash of the file generated at build time. If omitted,
+                     an entity tag is generated from the size and the
+                     modification time of the file. Ignored when a
+                     ``stream`` is given without an ``etag``.
+        :param request: The request that is being answered. If given, its
+                        ``If-None-Match`` and ``If-Modified-Since`` headers
+                        are checked, and a response with a 304 status code
+                        and no body is returned without opening the file
+                        when the client's cached copy is still valid.
+        :param buffer_size: The size of the chunks in which the file is read
+                            and sent. If omitted, the value of the
+                            :attr:`Response.send_file_buffer_size` attribute
+                            is used.
 
         Security note: The filename is assumed to be trusted. Never pass
         filenames provided by the user without validating and sanitizing them
@@ -805,12 +1360,227 @@ class Response:
         if max_age is not None:
             headers['Cache-Control'] = 'max-age={}'.format(max_age)
 
+        path = filename + file_extension
+        decode = None
         if compressed:
-            headers['Content-Encoding'] = compressed \
-                if isinstance(compressed, str) else 'gzip'
+            encoding = compressed if isinstance(compressed, str) else 'gzip'
+            if request is not None and stream is None:
+                # pick the variant of the file that the client can accept
+                headers['Vary'] = 'Accept-Encoding'
+                if not cls.accepts_encoding(request, encoding):
+                    if file_extension:
+                        identity = filename
+                    elif filename.endswith('.gz'):
+                        identity = filename[:-3]
+                    else:
+                        identity = None
+                    if identity and cls._file_exists(identity):
+                        path = identity
+                        encoding = None
+                    elif encoding in ('gzip', 'deflate'):
+                        decode = encoding
+                        encoding = None
+            if encoding:
+                headers['Content-Encoding'] = encoding
+
+        if stream is None:
+            st = os.stat(path)
+            if not decode:
+                headers['Content-Length'] = str(st[6])
+            if st[8]:
+                headers['Last-Modified'] = cls.http_date(st[8])
+            if etag is None:
+                etag = '"{:x}-{:x}"'.format(st[6], st[8])
+        if etag is not None:
+            if decode:
+                # the decompressed representation needs its own entity tag
+                etag = etag[:-1] + '-identity"' if etag.endswith('"') \
+                    else etag + '-identity'
+            headers['ETag'] = etag
+        if request is not None and status_code == 200 and \
+                cls.not_modified(request, headers):
+            return cls(body=b'', status_code=304, headers=headers,
+                       reason='Not Modified')
+
+        byte_range = None
+        if stream is None and not decode and status_code == 200:
+            headers['Accept-Ranges'] = 'bytes'
+            if request is not None:
+                byte_range = cls.requested_range(request, headers, st[6])
+            if byte_range is False:
+                return cls(body=b'', status_code=416,
+                           headers={'Content-Range': 'bytes */{}'.format(
+                               st[6])},
+                           reason='Range Not Satisfiable')
+            elif byte_range is not None:
+                status_code = 206
+                headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+                    byte_range[0], byte_range[1], st[6])
+                headers['Content-Length'] = str(
+                    byte_range[1] - byte_range[0] + 1)
+
+        if stream is None and not decode and cls.send_file_cache is not None:
+            body = cls.send_file_cache.fetch(path, (st[6], st[8]))
+            if body is not None and len(body) != st[6]:
+                # the file changed after it was checked, stream it instead
+                body = None
+            if body is not None:
+                if byte_range is not None:
+                    body = memoryview(body)[byte_range[0]:byte_range[1] + 1]
+                return cls(body=body, status_code=status_code,
+                           headers=headers, reason=None if status_code != 206
+                           else 'Partial Content')
+
+        f = stream or open(path, 'rb')
+        if byte_range is not None:
+            f.seek(byte_range[0])
+            f = FileRange(f, byte_range[1] - byte_range[0] + 1)
+        if decode:
+            f = decompress_stream(f, decode)
+        response = cls(body=f, status_code=status_code, headers=headers,
+                       reason=None if status_code != 206
+                       else 'Partial Content')
+        response.buffer_size = buffer_size
+        return response
+
+    @staticmethod
+    def _file_exists(path):
+        try:
+            os.stat(path)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def requested_range(request, headers, size):
+        """Return the byte range requested by the ``Range`` header of a
+        request, as a ``(first, last)`` tuple with inclusive offsets.
+
+        :param request: The request object.
+        :param headers: The response headers with the ``ETag`` and
+                        ``Last-Modified`` validators of the resource.
+        :param size: The size of the resource, in bytes.
+
+        ``None`` is returned when the whole resource must be sent, which
+        happens when there is no valid ``Range`` header, when the
+        ``If-Range`` validator does not match the resource, and when more
+        than one range is requested, as multipart responses are not
+        supported. ``False`` is returned when the range cannot be satisfied.
+        """
+        range_header = request.headers.get('Range')
+        if range_header is None or request.method != 'GET':
+            return None
+        if_range = request.headers.get('If-Range')
+        if if_range is not None:
+            if if_range.startswith('"'):
+                if if_range != headers.get('ETag'):
+                    return None
+            elif if_range != headers.get('Last-Modified'):
+                return None
+        if not range_header.startswith('bytes='):
+            return None
+        spec = range_header[6:].strip()
+        if ',' in spec:
+            return None
+        first, sep, last = spec.partition('-')
+        if not sep:
+            return None
+        try:
+            if first == '':
+                # suffix range with the last N bytes
+                last = int(last)
+                if last <= 0:
+                    return False
+                return max(0, size - last), size - 1
+            first = int(first)
+            last = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if first >= size:
+            return False
+        if last < first:
+            return None
+        return first, min(last, size - 1)
+
+    @staticmethod
+    def accepts_encoding(request, encoding):
+        """Return ``True`` if the client accepts responses with the given
+        content coding, according to the ``Accept-Encoding`` header of the
+        request.
+
+        :param request: The request object.
+        :param encoding: The content coding, for example ``'gzip'``.
+
+        A request without an ``Accept-Encoding`` header accepts any coding.
+        """
+        accept_encoding = request.headers.get('Accept-Encoding')
+        if accept_encoding is None:
+            return True
+        accepted = False
+        for item in accept_encoding.split(','):
+            name, _, params = item.partition(';')
+            name = name.strip().lower()
+            q = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            if name == encoding or (encoding == 'gzip' and name == 'x-gzip'):
+                return q > 0
+            elif name == '*':
+                accepted = q > 0
+        return accepted
+
+    @staticmethod
+    def http_date(timestamp):
+        """Format a timestamp, given in seconds since the epoch, as an HTTP
+        date string.
 
-        f = stream or open(filename + file_extension, 'rb')
-        return cls(body=f, status_code=status_code, headers=headers)
+        :param timestamp: The timestamp to format.
+        """
+        t = time.gmtime(timestamp)
+        return '{}, {:02d} {} {} {:02d}:{:02d}:{:02d} GMT'.format(
+            ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')[t[6]], t[2],
+            ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+             'Oct', 'Nov', 'Dec')[t[1] - 1], t[0], t[3], t[4], t[5])
+
+    @staticmethod
+    def not_modified(request, headers):
+        """Return ``True`` if the conditional headers of a request indicate
+        that the client already has the current version of a resource.
+
+        :param request: The request object.
+        :param headers: The response headers with the ``ETag`` and
+                        ``Last-Modified`` validators of the resource.
+
+        When the request has an ``If-None-Match`` header, the entity tag is
+        compared using the weak comparison function and
+        ``If-Modified-Since`` is ignored. Otherwise ``If-Modified-Since``
+        must match ``Last-Modified`` exactly.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etag = headers.get('ETag')
+            if etag is None:
+                return False
+            if if_none_match.strip() == '*':
+                return True
+            if etag.startswith('W/'):
+                etag = etag[2:]
+            for tag in if_none_match.split(','):
+                tag = tag.strip()
+                if tag.startswith('W/'):
+                    tag = tag[2:]
+                if tag == etag:
+                    return True
+            return False
+        if_modified_since = request.headers.get('If-Modified-Since')
+        return if_modified_since is not None and \
+            if_modified_since == headers.get('Last-Modified')
 
 
 class URLPattern():
@@ -823,13 +1593,16 @@ class URLPattern():
         'int': lambda value: int(value),
     }
 
+    __slots__ = ('url_pattern', 'segments', 'regex')
+
     def __init__(self, url_pattern):
         self.url_pattern = url_pattern
-        self.segments = []
+        self.segments = ()
         self.regex = None
 
     def compile(self):
         pattern = ''
+        segments = []
         for segment in self.url_pattern.lstrip('/').split('/'):
             if segment and segment[0] == '<':
                 if segment[-1] != '>':
@@ -848,14 +1621,33 @@ class URLPattern():
                         raise ValueError('invalid URL segment type')
                     pattern += self.segment_patterns[type_]
                     parser = self.segment_parsers.get(type_)
-                self.segments.append({'parser': parser, 'name': name,
-                                      'type': type_})
+                # only dynamic segments are stored, as (name, type, parser)
+                segments.append((name, type_, parser))
             else:
                 pattern += '/' + segment
-                self.segments.append({'parser': None})
+        self.segments = tuple(segments)
         self.regex = re.compile('^' + pattern + '$')
         return self.regex
 
+    @staticmethod
+    def _is_literal(pattern):
+        for c in '<.^$*+?{}[]\\|()':
+            if c in pattern:
+                return False
+        return True
+
+    def is_static(self):
+        """Return ``True`` if the pattern has no dynamic segments and no
+        regular expression characters, so that it only matches a path that is
+        identical to it."""
+        return self._is_literal(self.url_pattern)
+
+    def prefix(self):
+        """Return the first segment of the pattern, or ``None`` if the first
+        segment is dynamic and can match any value."""
+        segment = self.url_pattern.lstrip('/').split('/', 1)[0]
+        return segment if self._is_literal(segment) else None
+
     @classmethod
     def register_type(cls, type_name, pattern='[^/]+', parser=None):
         cls.segment_patterns[type_name] = '/({})'.format(pattern)
@@ -867,15 +1659,13 @@ class URLPattern():
         if not g:
             return
         i = 1
-        for segment in self.segments:
-            if 'name' not in segment:
-                continue
+        for name, type_, parser in self.segments:
             arg = g.group(i)
-            if segment['parser']:
-                arg = self.segment_parsers[segment['type']](arg)
+            if parser is not None:
+                arg = parser(arg)
                 if arg is None:
                     return
-            args[segment['name']] = arg
+            args[name] = arg
             i += 1
         return args
 
@@ -905,6 +1695,88 @@ class Microdot:
 
         app = Microdot()
     """
+    #: Enable HTTP/1.1 persistent connections. When set to ``True``, the
+    #: server keeps the connection open after a response and waits for more
+    #: requests from the same client, as long as the client allows it and the
+    #: length of the response is known in advance. The default is ``False``,
+    #: which closes the connection after each response.
+    #:
+    #: Example::
+    #:
+    #:    app.keep_alive = True
+    keep_alive = False
+
+    #: The number of seconds a persistent connection can stay idle while
+    #: waiting for the next request before the server closes it.
+    keep_alive_timeout = 5
+
+    #: The maximum number of requests that are served on a single persistent
+    #: connection. The connection is closed after the response to the last
+    #: allowed request.
+    max_keep_alive_requests = 100
+
+    #: Send streamed response bodies of unknown length, such as generators,
+    #: with the ``chunked`` transfer encoding when the client supports
+    #: HTTP/1.1. This allows these responses to use persistent connections.
+    #: When set to ``False``, the end of these bodies is indicated by closing
+    #: the connection.
+    chunked_responses = True
+
+    #: The number of seconds a client has to send the request line and
+    #: headers of a request. Connections that take longer are closed. Set to
+    #: ``None`` (the default) to wait indefinitely.
+    #:
+    #: Example::
+    #:
+    #:    app.header_timeout = 5
+    header_timeout = None
+
+    #: The number of seconds a client has to send the body of a request,
+    #: when the body is read by the server into ``Request.body``. Bodies that
+    #: are read from ``Request.stream``, such as chunked bodies, large bodies
+    #: and multipart uploads, are given this time for each read, and the
+    #: request is aborted with a 408 status code when a read takes longer.
+    #: Set to ``None`` (the default) to wait indefinitely.
+    body_timeout = None
+
+    #: The number of seconds each write of the response to the client can
+    #: take. Connections to clients that do not receive data for longer are
+    #: closed. Set to ``None`` (the default) to wait indefinitely.
+    write_timeout = None
+
+    #: The maximum number of connections that are handled concurrently. Set
+    #: to 0 (the default) to handle all connections as they arrive.
+    #:
+    #: Example::
+    #:
+    #:    app.max_connections = 4
+    max_connections = 0
+
+    #: The number of connections that can wait for a free slot when
+    #: ``max_connections`` connections are already being handled. Any
+    #: connections beyond this are rejected with a 503 response.
+    max_waiting_connections = 4
+
+    #: The number of seconds a connection can wait for a free slot before it
+    #: is rejected with a 503 response. Set to ``None`` to wait indefinitely.
+    connection_wait_timeout = 5
+
+    #: A list of ``(free_heap, max_connections)`` tuples that lower the
+    #: connection limit when the free heap memory drops below ``free_heap``
+    #: bytes. This only has an effect on MicroPython.
+    #:
+    #: Example::
+    #:
+    #:    app.heap_pressure_limits = [(32 * 1024, 2), (16 * 1024, 1)]
+    heap_pressure_limits = []
+
+    #: The response sent to connections that are rejected because the server
+    #: is at capacity. It is preformatted so that sending it does not need
+    #: any memory allocations.
+    overload_response = (b'HTTP/1.0 503 Service Unavailable\r\n'
+                         b'Content-Length: 0\r\n'
+                         b'Retry-After: 1\r\n'
+                         b'Connection: close\r\n\r\n')
 
     def __init__(self):
         self.url_map = []
@@ -916,6 +1788,15 @@ class Microdot:
         self.options_handler = self.default_options_handler
         self.debug = False
         self.server = None
+        self.static_routes = {}
+        self.static_paths = {}
+        self.dynamic_routes = {}
+        self.compiled_routes = 0
+        self.active_connections = 0
+        self.waiting_connections = 0
+        self.rejected_connections = 0
+        self.reaped_connections = 0
+        self.connection_released = asyncio.Event()
 
     def route(self, url_pattern, methods=None):
         """Decorator that is used to register a function as a request handler
@@ -1224,7 +2105,10 @@ class Microdot:
                 writer.awrite = MethodType(awrite, writer)
                 writer.aclose = MethodType(aclose, writer)
 
-            await self.handle_request(reader, writer)
+            if not await self.acquire_connection():
+                await self.reject_connection(reader, writer)
+                return
+            await self.handle_request(reader, writer, slot=True)
 
         if self.debug:  # pragma: no cover
             print('Starting async server on {host}:{port}...'.format(
@@ -1299,23 +2183,71 @@ class Microdot:
         """
         self.server.close()
 
+    def compile_routes(self):
+        """Build the routing table used by :meth:`find_route`.
+
+        Routes without dynamic components are indexed in a dictionary keyed
+        by ``(method, path)``. Routes with dynamic components are grouped by
+        the first segment of their URL pattern, so that only the patterns
+        that share the first segment of the requested path need to be
+        matched. Patterns that have a dynamic first segment are stored under
+        the ``None`` key. The table is rebuilt automatically when new routes
+        are added.
+        """
+        self.static_routes = {}
+        self.static_paths = {}
+        self.dynamic_routes = {}
+        for index, route in enumerate(self.url_map):
+            route_methods, route_pattern = route[0], route[1]
+            if route_pattern.is_static():
+                path = route_pattern.url_pattern
+                for method in route_methods:
+                    if (method, path) not in self.static_routes:
+                        self.static_routes[(method, path)] = index
+                self.static_paths.setdefault(path, []).append(index)
+            else:
+                self.dynamic_routes.setdefault(
+                    route_pattern.prefix(), []).append(index)
+        self.compiled_routes = len(self.url_map)
+
     def find_route(self, req):
         method = req.method.upper()
         if method == 'OPTIONS' and self.options_handler:
             return self.options_handler(req), '', None
         if method == 'HEAD':
             method = 'GET'
+        if self.compiled_routes != len(self.url_map):
+            self.compile_routes()
+        path = req.path
+        i = path.find('/', 1)
+        prefix = path[1:i] if i > 0 else path[1:]
+        candidates = self.dynamic_routes.get(prefix, []) + \
+            self.dynamic_routes.get(None, [])
+
+        index = self.static_routes.get((method, path))
+        if index is not None and (not candidates or min(candidates) > index):
+            # no dynamic route registered earlier can take precedence
+            _, route_pattern, route_handler, url_prefix, subapp = \
+                self.url_map[index]
+            req.url_args = {}
+            req.url_pattern = route_pattern.url_pattern
+            return route_handler, url_prefix, subapp
+
+        # match the candidate routes in the order they were registered
         f = 404
         p = ''
         s = None
-        for route_methods, route_pattern, route_handler, url_prefix, subapp \
-                in self.url_map:
-            req.url_args = route_pattern.match(req.path)
+        req.url_args = None
+        for index in sorted(candidates + self.static_paths.get(path, [])):
+            route_methods, route_pattern, route_handler, url_prefix, subapp \
+                = self.url_map[index]
+            req.url_args = route_pattern.match(path)
             if req.url_args is not None:
                 p = url_prefix
                 s = subapp
                 if method in route_methods:
                     f = route_handler
+                    req.url_pattern = route_pattern.url_pattern
                     break
                 else:
                     f = 405
@@ -1331,28 +2263,245 @@ class Microdot:
         allow.append('OPTIONS')
         return {'Allow': ', '.join(allow)}
 
-    async def handle_request(self, reader, writer):
-        req = None
+    async def handle_request(self, reader, writer, slot=False):
+        """Serve the requests that arrive on a connection.
+
+        :param reader: The input stream of the connection.
+        :param writer: The output stream of the connection.
+        :param slot: ``True`` if a slot was reserved for the connection with
+                     :meth:`acquire_connection`. The slot is released while
+                     the connection waits idle for its next request, when a
+                     long-lived response such as a WebSocket or an event
+                     stream takes over the connection, and when the
+                     connection ends.
+
+        This method is a coroutine.
+        """
+        # slot is True while the connection holds a slot, None while it has
+        # released it, for example to wait for its next request, and False if
+        # it does not take part in the connection limit
+        served = 0
         try:
-            req = await Request.create(self, reader, writer,
-                                       writer.get_extra_info('peername'))
-        except Exception as exc:  # pragma: no cover
-            print_exception(exc)
+            while True:
+                req = None
+                line = None
+                if served:
+                    # wait for the next request on a persistent connection,
+                    # only this wait is limited by the idle timeout
+                    try:
+                        line = await asyncio.wait_for(
+                            reader.readline(), self.keep_alive_timeout)
+                    except Exception:
+                        # idle timeout or connection lost between requests
+                        break
+                    if not line.strip():
+                        # the client closed the connection
+                        break
+                try:
+                    req = await Request.create(
+                        self, reader, writer,
+                        writer.get_extra_info('peername'), line=line)
+                except asyncio.TimeoutError:
+                    # the client was too slow sending its request
+                    self.reaped_connections += 1
+                    break
+                except Exception as exc:  # pragma: no cover
+                    print_exception(exc)
+
+                if slot is None:
+                    # the connection was idle, it needs a slot again
+                    if not await self.acquire_connection():
+                        try:
+                            await writer.awrite(self.overload_response)
+                        except OSError as exc:  # pragma: no cover
+                            if exc.errno not in MUTED_SOCKET_ERRORS:
+                                raise
+                        break
+                    slot = True
+                if req:
+                    req.connection_slot = slot
+                served += 1
+                res = await self.dispatch_request(req)
+                if req and slot and not req.connection_slot:
+                    # a long-lived response released the slot, a request
+                    # that follows it on this connection needs a new one
+                    slot = None
+                if self.chunked_responses and req and \
+                        req.http_version == '1.1' and \
+                        res != Response.already_handled:
+                    res.use_chunked_encoding()
+                keep_alive = self.keep_alive_allowed(req, res, served)
+                if (self.keep_alive or res.chunked) and \
+                        res != Response.already_handled:
+                    res.http_version = '1.1'
+                    res.headers['Connection'] = \
+                        'keep-alive' if keep_alive else 'close'
+                try:
+                    if res != Response.already_handled:  # pragma: no branch
+                        await res.write(writer, self.write_timeout)
+                except OSError as exc:  # pragma: no cover
+                    if exc.errno in MUTED_SOCKET_ERRORS:
+                        keep_alive = False
+                    elif exc.errno == ETIMEDOUT:
+                        # the client was too slow receiving the response
+                        self.reaped_connections += 1
+                        keep_alive = False
+                    else:
+                        raise
+                if self.debug and req:  # pragma: no cover
+                    print('{method} {path} {status_code}'.format(
+                        method=req.method, path=req.path,
+                        status_code=res.status_code))
+                if not keep_alive:
+                    break
+                if slot:
+                    # an idle connection does not keep other clients waiting
+                    self.release_connection(req)
+                    slot = None
+        finally:
+            if slot:
+                self.release_connection(req)
 
-        res = await self.dispatch_request(req)
         try:
-            if res != Response.already_handled:  # pragma: no branch
-                await res.write(writer)
             await writer.aclose()
         except OSError as exc:  # pragma: no cover
             if exc.errno in MUTED_SOCKET_ERRORS:
                 pass
             else:
                 raise
-        if self.debug and req:  # pragma: no cover
-            print('{method} {path} {status_code}'.format(
-                method=req.method, path=req.path,
-                status_code=res.status_code))
+
+    def connection_limit(self):
+        """Return the current maximum number of concurrent connections, or 0
+        if there is no limit.
+
+        The limit is ``max_connections``, lowered by the entries in
+        ``heap_pressure_limits`` that apply to the current free heap memory.
+        """
+        limit = self.max_connections
+        if self.heap_pressure_limits and hasattr(gc, 'mem_free'):
+            free = gc.mem_free()
+            for free_heap, max_connections in self.heap_pressure_limits:
+                if free < free_heap and (not limit or max_connections < limit):
+                    limit = max_connections
+        return limit
+
+    async def acquire_connection(self):
+        """Reserve a slot for a new connection, waiting for one to be released
+        if the server is at capacity. Returns ``False`` if the connection
+        should be rejected because the wait queue is also full, or because no
+        slot was released within ``connection_wait_timeout`` seconds.
+
+        This method is a coroutine.
+        """
+        limit = self.connection_limit()
+        if limit and self.active_connections >= limit:
+            if self.waiting_connections >= self.max_waiting_connections:
+                self.rejected_connections += 1
+                return False
+            self.waiting_connections += 1
+            try:
+                await with_timeout(self._wait_for_slot(),
+                                   self.connection_wait_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_connections += 1
+                return False
+            finally:
+                self.waiting_connections -= 1
+            return True
+        self.active_connections += 1
+        return True
+
+    async def _wait_for_slot(self):
+        # all the waiters wake up when a slot is released, so the slot has to
+        # be taken in the same step in which the limit is checked
+        while True:
+            limit = self.connection_limit()
+            if not limit or self.active_connections < limit:
+                self.active_connections += 1
+                return
+            self.connection_released.clear()
+            await self.connection_released.wait()
+
+    def release_connection(self, req=None):
+        """Release the slot reserved for a connection.
+
+        :param req: The request that holds the slot, if known. The slot is
+                    only released if the request still holds it.
+
+        Handlers that take over the connection for a long time, such as
+        WebSocket and Server-Sent Events endpoints, release the slot of their
+        request, so that they do not count towards the connection limit.
+        """
+        if req is not None:
+            if not req.connection_slot:
+                return
+            req.connection_slot = False
+        self.active_connections -= 1
+        self.connection_released.set()
+
+    async def reject_connection(self, reader, writer):
+        """Send the ``overload_response`` and close the connection.
+
+        :param reader: The input stream of the connection.
+        :param writer: The output stream of the connection.
+
+        This method is a coroutine.
+        """
+        try:
+            # consume the request, as closing a socket that has unread data
+            # resets the connection before the client sees the response
+            await asyncio.wait_for(reader.read(Request.max_readline), 0.5)
+        except Exception:
+            pass
+        try:
+            await writer.awrite(self.overload_response)
+            await writer.aclose()
+        except OSError as exc:  # pragma: no cover
+            if exc.errno not in MUTED_SOCKET_ERRORS:
+                raise
+
+    def connection_stats(self):
+        """Return a dictionary with the connection counters."""
+        return {
+            'active': self.active_connections,
+            'waiting': self.waiting_connections,
+            'rejected': self.rejected_connections,
+            'reaped': self.reaped_connections,
+            'limit': self.connection_limit(),
+        }
+
+    def keep_alive_allowed(self, req, res, served):
+        """Return ``True`` if the connection can be reused for another
+        request after sending the given response.
+
+        :param req: The request object, or ``None`` if the request could not
+                    be parsed.
+        :param res: The response object that is about to be sent.
+        :param served: The number of requests served on this connection so
+                       far, including this one.
+        """
+        if not self.keep_alive or req is None or \
+                res == Response.already_handled or \
+                served >= self.max_keep_alive_requests:
+            return False
+
+        # the client must agree to keep the connection open
+        connection = req.headers.get('Connection', '').lower()
+        if 'close' in connection:
+            return False
+        if req.http_version != '1.1' and 'keep-alive' not in connection:
+            return False
+
+        # any unread request body would be parsed as the next request
+        if 'Transfer-Encoding' in req.headers or \
+                len(req.body) < req.content_length:
+            return False
+
+        # the client must be able to find the end of the response body
+        res.complete()
+        return res.is_head or res.chunked or \
+            'Content-Length' in res.headers or \
+            res.status_code == 204 or res.status_code == 304
 
     def get_request_handlers(self, req, attr, local_first=True):
         handlers = getattr(self, attr + '_handlers')
@@ -0,0 +1,302 @@
+"""
+multipart
+---------
+
+The ``multipart`` module parses ``multipart/form-data`` request bodies
+incrementally, so that large file uploads can be processed without holding
+them in memory.
+"""
+from microdot import Request, abort
+from microdot.microdot import MultiDict, AsyncBytesIO, ChunkedStream, \
+    invoke_handler
+from microdot.helpers import wraps
+
+
+class FormDataIter:
+    """Asynchronous iterator that parses a ``multipart/form-data`` body and
+    returns form fields and files as they are parsed.
+
+    :param request: the request object to parse.
+
+    Example::
+
+        from microdot.multipart import FormDataIter, FileUpload
+
+        @app.post('/upload')
+        async def upload(request):
+            async for name, value in FormDataIter(request):
+                if isinstance(value, FileUpload):
+                    await value.save('/sd/' + value.filename)
+                else:
+                    print(name, value)
+
+    The iterator returns no values when the request has a content type other
+    than ``multipart/form-data``. Values for regular fields are returned as
+    strings. For a file field the value is a :class:`FileUpload` instance,
+    which must be consumed before moving on to the next iteration, as any
+    unread data is discarded when the next field is parsed.
+
+    The body is read from the request stream in chunks of
+    :attr:`buffer_size` bytes, so the memory used by the parser does not
+    depend on the size of the request.
+    """
+    #: The number of bytes that are read from the request stream at a time.
+    buffer_size = 512
+
+    #: The maximum length of a regular (non-file) form field.
+    max_field_length = 1024
+
+    def __init__(self, request):
+        self.request = request
+        self.boundary = None
+        content_type = request.content_type or ''
+        if content_type.split(';', 1)[0].strip().lower() != \
+                'multipart/form-data':
+            return
+        for param in content_type.split(';')[1:]:
+            param = param.strip()
+            if param.startswith('boundary='):
+                boundary = param[9:]
+                if boundary.startswith('"') and boundary.endswith('"'):
+                    boundary = boundary[1:-1]
+                # the boundary is preceded by a line break, which for the
+                # first boundary is inserted in the buffer below
+                self.boundary = b'\r\n--' + boundary.encode()
+        if self.boundary is None:
+            abort(400)  # pragma: no cover
+        self.stream = request.stream
+        self.remaining = None if isinstance(self.stream, ChunkedStream) \
+            else request.content_length
+        self.buffer = b'\r\n'
+        self.at_boundary = True
+        self.done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.boundary is None or self.done:
+            raise StopAsyncIteration
+
+        # discard any unread data from the previous part
+        while await self.read_part(self.buffer_size):
+            pass
+
+        # the buffer must now start with a boundary, followed by a line break
+        # for a new part or by "--" for the end of the body
+        n = len(self.boundary)
+        await self._fill(n + 2)
+        if not self.buffer.startswith(self.boundary):
+            abort(400)
+        end = self.buffer[n:n + 2]
+        if end == b'--':
+            self.done = True
+            raise StopAsyncIteration
+        elif end != b'\r\n':
+            abort(400)
+        self.buffer = self.buffer[n + 2:]
+        self.at_boundary = False
+
+        # part headers
+        name = ''
+        filename = None
+        content_type = None
+        while True:
+            line = await self._readline()
+            if not line:
+                break
+            if b':' not in line:
+                abort(400)
+            header, value = line.decode().split(':', 1)
+            header = header.strip().lower()
+            value = value.strip()
+            if header == 'content-disposition':
+                params = value.split(';')
+                if params[0].strip().lower() != 'form-data':
+                    abort(400)
+                for param in params[1:]:
+                    param = param.strip()
+                    if param.startswith('name="'):
+                        name = param[6:-1]
+                    elif param.startswith('filename="'):
+                        filename = param[10:-1]
+            elif header == 'content-type':
+                content_type = value
+
+        if filename is None:
+            # regular form field
+            value = b''
+            while True:
+                data = await self.read_part(self.buffer_size)
+                if not data:
+                    break
+                value += data
+                if len(value) > self.max_field_length:
+                    abort(413)
+            return name, value.decode()
+        return name, FileUpload(filename, content_type, self.read_part)
+
+    async def read_part(self, n):
+        """Read up to ``n`` bytes of the part that is being parsed. Returns
+        an empty bytes object when the end of the part is reached.
+
+        :param n: the maximum number of bytes to return.
+        """
+        if self.at_boundary:
+            return b''
+        boundary_length = len(self.boundary)
+        while True:
+            i = self.buffer.find(self.boundary)
+            if i >= 0 or len(self.buffer) >= n + boundary_length:
+                break
+            data = await self._read()
+            if not data:
+                # the body ended before the closing boundary
+                abort(400)
+            self.buffer += data
+        if 0 <= i <= n:
+            data = self.buffer[:i]
+            self.buffer = self.buffer[i:]
+            self.at_boundary = True
+        else:
+            data = self.buffer[:n]
+            self.buffer = self.buffer[n:]
+        return data
+
+    async def _readline(self):
+        while True:
+            i = self.buffer.find(b'\r\n')
+            if i >= 0:
+                line = self.buffer[:i]
+                self.buffer = self.buffer[i + 2:]
+                return line
+            if len(self.buffer) > Request.max_readline:
+                abort(400)
+            data = await self._read()
+            if not data:
+                abort(400)
+            self.buffer += data
+
+    async def _fill(self, n):
+        while len(self.buffer) < n:
+            data = await self._read()
+            if not data:
+                break
+            self.buffer += data
+
+    async def _read(self):
+        n = self.buffer_size
+        if self.remaining is not None:
+            # never read past the end of the body
+            n = min(n, self.remaining)
+            if n <= 0:
+                return b''
+        data = await self.stream.read(n)
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return data
+
+
+class FileUpload:
+    """A file uploaded in a ``multipart/form-data`` request.
+
+    :param filename: the name of the file, as given by the client.
+    :param content_type: the content type of the file, or ``None`` if the
+                         client did not provide it.
+    :param read: a coroutine function that reads up to the given number of
+                 bytes of the file contents.
+    """
+    def __init__(self, filename, content_type, read):
+        #: The name of the file, as given by the client.
+        self.filename = filename
+        #: The content type of the file.
+        self.content_type = content_type
+        self._read = read
+
+    async def read(self, n=-1):
+        """Read up to ``n`` bytes of the file contents. If ``n`` is omitted,
+        the remaining contents are read into memory and returned.
+
+        :param n: the maximum number of bytes to return.
+
+        This method is a coroutine.
+        """
+        if n >= 0:
+            return await self._read(n)
+        data = b''
+        while True:
+            chunk = await self._read(FormDataIter.buffer_size)
+            if not chunk:
+                return data
+            data += chunk
+
+    async def save(self, path_or_file, chunk_size=None):
+        """Write the file contents to a file, in chunks of a fixed size.
+        Returns the number of bytes written.
+
+        :param path_or_file: the path of the file to write, or an open file
+                             object with a ``write()`` method.
+        :param chunk_size: the number of bytes to write at a time. If
+                           omitted, :attr:`FormDataIter.buffer_size` is used.
+
+        This method is a coroutine.
+        """
+        chunk_size = chunk_size or FormDataIter.buffer_size
+        f = open(path_or_file, 'wb') if isinstance(path_or_file, str) \
+            else path_or_file
+        size = 0
+        try:
+            while True:
+                data = await self._read(chunk_size)
+                if not data:
+                    break
+                f.write(data)
+                size += len(data)
+        finally:
+            if f is not path_or_file:
+                f.close()
+        return size
+
+
+def with_form_data(f):
+    """Decorator that parses a ``multipart/form-data`` body before invoking
+    the route, and makes the fields and files available in
+    :attr:`Request.form <microdot.Request.form>` and
+    :attr:`Request.files <microdot.Request.files>`.
+
+    Example::
+
+        from microdot.multipart import with_form_data
+
+        @app.post('/settings')
+        @with_form_data
+        async def settings(request):
+            print(request.form['name'])
+            data = await request.files['logo'].read()
+
+    The uploaded files are read into memory, up to a total of
+    :attr:`Request.max_content_length <microdot.Request.max_content_length>`
+    bytes. Routes that need to accept larger files should use
+    :class:`FormDataIter` to process the body as it arrives.
+    """
+    @wraps(f)
+    async def wrapper(request, *args, **kwargs):
+        form = MultiDict()
+        files = MultiDict()
+        size = 0
+        async for name, value in FormDataIter(request):
+            if isinstance(value, FileUpload):
+                data = await value.read()
+                size += len(data)
+                if size > Request.max_content_length:
+                    abort(413)
+                value = FileUpload(value.filename, value.content_type,
+                                   AsyncBytesIO(data).read)
+                files[name] = value
+            else:
+                form[name] = value
+        request._form = form
+        request._files = files
+        return await invoke_handler(f, request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,171 @@
+"""
+sse
+---
+
+The ``sse`` module implements Server-Sent Events, a lightweight way of
+pushing a stream of events from the server to the client over a regular
+HTTP response.
+"""
+import asyncio
+import json
+from microdot import Response
+from microdot.microdot import print_exception
+from microdot.helpers import wraps
+
+
+class SSE:
+    """Server-Sent Events object.
+
+    An instance of this class is sent to handler functions to manage the SSE
+    connection. Events are queued with :meth:`send` and written to the
+    client as the response is streamed.
+    """
+    #: The number of seconds without events after which a comment line is
+    #: sent to the client, to keep intermediaries from closing the connection
+    #: and to detect clients that went away. Set to ``None`` to disable.
+    heartbeat = 15
+
+    #: The maximum number of events waiting to be sent to a client. When a
+    #: slow client falls behind by more than this, the event stream is ended
+    #: instead of dropping events. The client then reconnects, sending the ID
+    #: of the last event it received in the ``Last-Event-ID`` header.
+    max_queue = 16
+
+    def __init__(self, request):
+        self.event = asyncio.Event()
+        self.queue = []
+        self.closed = asyncio.Event()
+        #: ``True`` if the client fell behind by more than ``max_queue``
+        #: events and the stream was ended.
+        self.overflowed = False
+        #: The value of the ``Last-Event-ID`` header sent by a reconnecting
+        #: client, or ``None`` if the client did not send it.
+        self.last_event_id = request.headers.get('Last-Event-ID')
+
+    async def send(self, data, event=None, event_id=None):
+        """Send an event to the client.
+
+        :param data: the event data. If a dictionary or list is given, it is
+                     serialized to JSON.
+        :param event: an optional event type, which the client can use to
+                      dispatch the event to a specific listener.
+        :param event_id: an optional event ID. The client sends the last ID
+                         it received in the ``Last-Event-ID`` header when it
+                         reconnects.
+
+        This method is a coroutine.
+        """
+        self.send_nowait(data, event=event, event_id=event_id)
+
+    def send_nowait(self, data, event=None, event_id=None):
+        """Queue an event for the client without waiting.
+
+        The arguments are the same as in :meth:`send`. This method can be
+        called from code that is not a coroutine, such as a function that
+        sends an event to many clients.
+        """
+        if self.overflowed:
+            return
+        if isinstance(data, (dict, list)):
+            data = json.dumps(data).encode()
+        elif isinstance(data, str):
+            data = data.encode()
+        elif not isinstance(data, bytes):
+            data = str(data).encode()
+        data = b'data: ' + data.replace(b'\n', b'\ndata: ') + b'\n\n'
+        if event_id is not None:
+            data = b'id: ' + str(event_id).encode() + b'\n' + data
+        if event:
+            data = b'event: ' + event.encode() + b'\n' + data
+        if len(self.queue) >= self.max_queue:
+            # dropping an event would leave the client out of step
+            self.overflowed = True
+            self.queue = []
+        else:
+            self.queue.append(data)
+        self.event.set()
+
+    async def wait_closed(self):
+        """Wait until the client disconnects.
+
+        This method is a coroutine.
+        """
+        await self.closed.wait()
+
+
+def sse_response(request, event_function, *args, **kwargs):
+    """Return a response object that initiates an event stream.
+
+    :param request: the request object.
+    :param event_function: an asynchronous function that will send events to
+                           the client. The function is invoked with
+                           ``request`` and an ``sse`` object. The function
+                           should use ``sse.send()`` to send events to the
+                           client. The event stream ends when this function
+                           returns.
+    :param args: additional positional arguments to be passed to the
+                 function.
+    :param kwargs: additional keyword arguments to be passed to the function.
+    """
+    sse = SSE(request)
+    # the event stream is not going to end soon, so it does not need to
+    # count towards the connection limit
+    request.app.release_connection(request)
+
+    async def sse_task_wrapper():
+        try:
+            await event_function(request, sse, *args, **kwargs)
+        except asyncio.CancelledError:  # pragma: no cover
+            pass
+        except Exception as exc:  # pragma: no cover
+            print_exception(exc)
+        sse.event.set()
+
+    task = asyncio.create_task(sse_task_wrapper())
+
+    class sse_loop:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            while not sse.queue:
+                if task.done() or sse.overflowed:
+                    raise StopAsyncIteration
+                try:
+                    if sse.heartbeat:
+                        await asyncio.wait_for(sse.event.wait(),
+                                               sse.heartbeat)
+                    else:
+                        await sse.event.wait()
+                except asyncio.TimeoutError:
+                    return b': heartbeat\n\n'
+                sse.event.clear()
+            return sse.queue.pop(0)
+
+        async def aclose(self):
+            sse.closed.set()
+            task.cancel()
+
+    return Response(sse_loop(), headers={'Content-Type': 'text/event-stream',
+                                         'Cache-Control': 'no-cache'})
+
+
+def with_sse(f):
+    """Decorator to make a route a Server-Sent Events endpoint.
+
+    This decorator is used to define a route that accepts SSE connections.
+    The route then receives a sse object as a second argument that it can use
+    to send events to the client::
+
+        @app.route('/events')
+        @with_sse
+        async def events(request, sse):
+            for i in range(10):
+                await asyncio.sleep(1)
+                await sse.send(f'{i}')
+    """
+    @wraps(f)
+    async def sse_handler(request, *args, **kwargs):
+        return sse_response(request, f, *args, **kwargs)
+
+    return sse_handler
@@ -5,6 +5,34 @@ from microdot.microdot import MUTED_SOCKET_ERRORS, print_exception
 from microdot.helpers import wraps
 
 
+#: The number of bytes that the portable unmask function XORs at a time.
+UNMASK_CHUNK = 2048
+
+
+def _unmask(buf, mask, n):
+    # XOR the payload in chunks, each as a single integer that CPython
+    # processes in machine words, so that the integers stay small however
+    # large the payload is
+    if not n:
+        return
+    size = min(n, UNMASK_CHUNK)
+    key = int.from_bytes(mask * (size // 4) + mask[:size % 4], 'little')
+    view = memoryview(buf)
+    for i in range(0, n, size):
+        chunk = view[i:min(i + size, n)]
+        k = key if len(chunk) == size else \
+            key & ((1 << (len(chunk) * 8)) - 1)
+        chunk[:] = (int.from_bytes(chunk, 'little') ^ k).to_bytes(
+            len(chunk), 'little')
+
+
+try:
+    from microdot.websocket_native import unmask
+except (ImportError, SyntaxError, ValueError):  # pragma: no cover
+    # no viper support, which is always the case on CPython
+    unmask = _unmask
+
+
 class WebSocketError(Exception):
     """Exception raised when an error occurs in a WebSocket connection."""
     pass
@@ -38,6 +66,10 @@ class WebSocket:
     def __init__(self, request):
         self.request = request
         self.closed = False
+        # masked payloads are read and unmasked in this buffer, which is
+        # reused for all the frames of the connection and grows to the size
+        # of the largest one
+        self.buffer = None
 
     async def handshake(self):
         response = self._handshake_response()
@@ -66,11 +98,31 @@ class WebSocket:
                        is ``TEXT`` or ``BINARY`` depending on the type of the
                        data.
         """
-        frame = self._encode_websocket_frame(
-            opcode or (self.TEXT if isinstance(data, str) else self.BINARY),
-            data)
+        await self.send_frame(self.encode_frame(data, opcode))
+
+    async def send_frame(self, frame):
+        """Send a message that was encoded with :meth:`encode_frame`.
+
+        :param frame: the encoded frame.
+        """
         await self.request.sock[1].awrite(frame)
 
+    @classmethod
+    def encode_frame(cls, data, opcode=None):
+        """Encode a message as a WebSocket frame.
+
+        :param data: the data to encode, given as a string or bytes.
+        :param opcode: a custom frame opcode to use. If not given, the opcode
+                       is ``TEXT`` or ``BINARY`` depending on the type of the
+                       data.
+
+        A message that is sent to many clients can be encoded once and then
+        sent to each client with :meth:`send_frame`.
+        """
+        return cls._encode_websocket_frame(
+            opcode or (cls.TEXT if isinstance(data, str) else cls.BINARY),
+            data)
+
     async def close(self):
         """Close the websocket connection."""
         if not self.closed:  # pragma: no cover
@@ -160,10 +212,30 @@ class WebSocket:
             raise WebSocketError('Message too large')
         if has_mask:  # pragma: no cover
             mask = await self.request.sock[0].read(4)
-        payload = await self.request.sock[0].read(length)
-        if has_mask:  # pragma: no cover
-            payload = bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
-        return opcode, payload
+        if not has_mask or not length:  # pragma: no cover
+            payload = await self.request.sock[0].read(length)
+            return opcode, payload
+        if self.buffer is None or len(self.buffer) < length:
+            self.buffer = bytearray(length)
+        await self._read_into(self.buffer, length)
+        unmask(self.buffer, mask, length)
+        return opcode, bytes(memoryview(self.buffer)[:length])
+
+    async def _read_into(self, buf, length):
+        """Read exactly ``length`` bytes from the client into ``buf``."""
+        stream = self.request.sock[0]
+        view = memoryview(buf)
+        received = 0
+        while received < length:
+            if hasattr(stream, 'readinto'):  # pragma: no cover
+                n = await stream.readinto(view[received:length])
+            else:
+                data = await stream.read(length - received)
+                n = len(data)
+                view[received:received + n] = data
+            if not n:
+                raise WebSocketError('Websocket connection closed')
+            received += n
 
 
 async def websocket_upgrade(request):
@@ -184,6 +256,9 @@ async def websocket_upgrade(request):
     """
     ws = WebSocket(request)
     await ws.handshake()
+    # the connection is not going to serve other requests, so it does not
+    # need to count towards the connection limit
+    request.app.release_connection(request)
 
     @request.after_request
     async def after_request(request, response):
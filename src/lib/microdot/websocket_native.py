@@ -0,0 +1,40 @@
+"""
+websocket_native
+----------------
+
+Native code helpers for the ``websocket`` module. This module can only be
+imported by MicroPython ports that support the viper code emitter, the
+``websocket`` module falls back to portable implementations when it is not
+available.
+"""
+import micropython
+
+
+@micropython.viper
+def unmask(buf, mask, n):
+    """XOR a bytearray in place with a 4-byte WebSocket masking key.
+
+    :param buf: The buffer with the payload to unmask, as a ``bytearray``.
+                The payload is processed in 32-bit words, which relies on
+                the storage of a ``bytearray`` being allocated on the heap
+                and therefore word aligned. Slices or views of other buffers
+                must not be given.
+    :param mask: The masking key.
+    :param n: The length of the payload, which starts at the beginning of
+              ``buf`` and can be shorter than it.
+    """
+    n = int(n)
+    b = ptr8(buf)  # noqa: F821
+    m = ptr8(mask)  # noqa: F821
+    w = ptr32(buf)  # noqa: F821
+    # the key as a little-endian word, the byte order of the supported CPUs
+    key = m[0] | (m[1] << 8) | (m[2] << 16) | (m[3] << 24)
+    words = n >> 2
+    i = 0
+    while i < words:
+        w[i] ^= key
+        i += 1
+    i = words << 2
+    while i < n:
+        b[i] ^= m[i & 3]
+        i += 1
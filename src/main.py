@@ -1,5 +1,8 @@
-from lib.microdot import Microdot, send_file
+from lib.microdot import Microdot, Response, send_file
 from lib.microdot.websocket import with_websocket
+from lib.microdot.sse import SSE, with_sse
+from lib.microdot.asset_cache import AssetCache
+from lib.microdot.asset_manifest import AssetManifest
 import uasyncio as asyncio
 import machine
 from model.model import AudioModel
@@ -7,22 +10,64 @@ from model.wifi.wifi_manager import WiFiManager
 from app.websocket_handler import WebSocketHandler
 from app.routes.wifi_routes import WiFiRoutes
 from app.routes.audio_routes import AudioRoutes
-from app.config import SERVER_PORT
+from app.config import SERVER_PORT, HTTP_KEEP_ALIVE, HTTP_KEEP_ALIVE_TIMEOUT, HTTP_MAX_KEEP_ALIVE_REQUESTS
+from app.config import HTTP_HEADER_TIMEOUT, HTTP_BODY_TIMEOUT, HTTP_WRITE_TIMEOUT
+from app.config import HTTP_MAX_CONNECTIONS, HTTP_MAX_WAITING_CONNECTIONS, HTTP_HEAP_PRESSURE_LIMITS
+from app.config import HTTP_CONNECTION_WAIT_TIMEOUT
+from app.config import STATIC_CACHE_MAX_SIZE, STATIC_CACHE_MAX_ITEM_SIZE, ASSET_MANIFEST_FILE
+from app.config import SSE_HEARTBEAT_INTERVAL
+from app.config import WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT, WS_STALL_TIMEOUT, WS_EQ_BROADCAST_INTERVAL_MS
+from app.config import METRICS_SAMPLE_EVERY, METRICS_LOOP_LAG_INTERVAL_MS
+from app.config import DUAL_CORE_ENABLED, CORE1_INTERVAL_MS, CORE1_DISPATCH_INTERVAL_MS, CORE1_QUEUE_SIZE
+from app.middleware import request_metrics
+from app.metrics import MetricsExporter
 from app.logger import main_logger
 from app.uart_service import UARTService
+from app.dual_core import DualCoreWorker
 
 # === Core 0 functions below ===
 
 # === App setup ===
 app = Microdot()
-model = AudioModel()
+app.keep_alive = HTTP_KEEP_ALIVE
+app.keep_alive_timeout = HTTP_KEEP_ALIVE_TIMEOUT
+app.max_keep_alive_requests = HTTP_MAX_KEEP_ALIVE_REQUESTS
+app.header_timeout = HTTP_HEADER_TIMEOUT
+app.body_timeout = HTTP_BODY_TIMEOUT
+app.write_timeout = HTTP_WRITE_TIMEOUT
+app.max_connections = HTTP_MAX_CONNECTIONS
+app.max_waiting_connections = HTTP_MAX_WAITING_CONNECTIONS
+app.connection_wait_timeout = HTTP_CONNECTION_WAIT_TIMEOUT
+app.heap_pressure_limits = HTTP_HEAP_PRESSURE_LIMITS
+SSE.heartbeat = SSE_HEARTBEAT_INTERVAL
+request_metrics.set_sampling(METRICS_SAMPLE_EVERY)
+request_metrics.register(app)
+if STATIC_CACHE_MAX_SIZE:
+    Response.send_file_cache = AssetCache(STATIC_CACHE_MAX_SIZE, STATIC_CACHE_MAX_ITEM_SIZE)
+try:
+    asset_manifest = AssetManifest.load(ASSET_MANIFEST_FILE)
+    main_logger.info(f"Loaded asset manifest with {len(asset_manifest.assets)} assets")
+except OSError:
+    # Not a build (e.g. running from src/), serve static files from the filesystem
+    asset_manifest = None
+except (ValueError, KeyError) as e:
+    # A truncated or corrupt manifest, the files it lists are still on disk
+    main_logger.warn(f"Ignoring invalid asset manifest: {e}")
+    asset_manifest = None
+model = AudioModel(dual_core=DUAL_CORE_ENABLED)
+model.ws_manager.queue_size = WS_SEND_QUEUE_SIZE
+model.ws_manager.send_timeout = WS_SEND_TIMEOUT
+model.ws_manager.stall_timeout = WS_STALL_TIMEOUT
+model.ws_manager.eq_interval_ms = WS_EQ_BROADCAST_INTERVAL_MS
 wifi_manager = WiFiManager()
 uart_service = UARTService()
+core1_worker = DualCoreWorker(model, uart_service, CORE1_INTERVAL_MS, CORE1_QUEUE_SIZE) if DUAL_CORE_ENABLED else None
 
 # === Route handlers ===
 ws_handler = WebSocketHandler(model, uart_service)
 wifi_routes = WiFiRoutes(wifi_manager)
 audio_routes = AudioRoutes(model, uart_service)
+metrics_exporter = MetricsExporter(app, model, uart_service, request_metrics)
 
 # Static routes
 # add max age to the parameters to enable caching for faster page loading 
@@ -30,14 +75,19 @@ audio_routes = AudioRoutes(model, uart_service)
 @app.route('/')
 def index(request):
     """Serve the main dashboard with compression support"""
-    return send_file('templates/dashboard.min.html', compressed=True,  file_extension='.gz', max_age=31536000)
+    if asset_manifest is not None:
+        return asset_manifest.send_asset('/', request) or ('Not found', 404)
+    return send_file('templates/dashboard.min.html', compressed=True,  file_extension='.gz', max_age=31536000, request=request)
 
 @app.route('/static/<path:path>')
 def static_files(request, path):
     """Serve static files with security checks"""
+    if asset_manifest is not None:
+        # Only files listed in the manifest exist, unknown paths never reach the filesystem
+        return asset_manifest.send_asset(request.path, request) or ('Not found', 404)
     if '..' in path:
         return 'Forbidden', 403
-    return send_file(f'static/{path}', compressed=True, file_extension='.gz',max_age=31536000)
+    return send_file(f'static/{path}', compressed=True, file_extension='.gz',max_age=31536000, request=request)
 
 
 # API routes - delegate to AudioRoutes class
@@ -81,6 +131,11 @@ def system_info(request):
     """System information endpoint"""
     return audio_routes.system_info(request)
 
+@app.route('/metrics')
+def metrics(request):
+    """Prometheus metrics"""
+    return metrics_exporter.get_metrics(request)
+
 # WebSocket route
 @app.route('/ws')
 @with_websocket
@@ -88,6 +143,13 @@ async def websocket_handler(request, ws):
     """Handle WebSocket connections using dedicated handler"""
     await ws_handler.handle_connection(ws)
 
+# Server-Sent Events route - receive-only alternative to the WebSocket
+@app.route('/events')
+@with_sse
+async def events_handler(request, sse):
+    """Stream state updates to read-only clients"""
+    await ws_handler.handle_sse_connection(sse)
+
 # WiFi routes - delegate to WiFiRoutes class
 @app.route('/wifi/status')
 def wifi_status(request):
@@ -150,7 +212,14 @@ async def setup_network():
 async def setup_background_tasks():
     main_logger.info("Starting background tasks...")
     try:
-        asyncio.create_task(model.monitor_dials_loop())
+        if core1_worker:
+            # Dials, buttons and UART writes run on core 1, core 0 applies their results
+            core1_worker.start()
+            asyncio.create_task(core1_worker.dispatch_loop(CORE1_DISPATCH_INTERVAL_MS))
+            main_logger.info("Hardware polling started on core 1")
+        else:
+            asyncio.create_task(model.monitor_dials_loop())
+        asyncio.create_task(metrics_exporter.monitor_loop_lag(METRICS_LOOP_LAG_INTERVAL_MS))
         main_logger.info("Background tasks started successfully")
     except Exception as e:
         main_logger.exception("Background tasks error", e)
@@ -167,6 +236,8 @@ if __name__ == "__main__":
         asyncio.run(main())
     except KeyboardInterrupt:
         main_logger.info("Server stopped by user")
+        if core1_worker:
+            core1_worker.stop()
         uart_service.deinit()
     except Exception as e:
         main_logger.exception("Fatal error", e)
@@ -3,6 +3,9 @@ import uasyncio as asyncio
 import time
 
 class EQProcessor:
+    # Update sources counted individually, anything else is counted as 'other'
+    UPDATE_SOURCES = ('physical', 'digital', 'web')
+    
     def __init__(self, deadzone=300):
         self.adc = {
             "low": ADC(26),
@@ -20,10 +23,19 @@ class EQProcessor:
         self.last_control_source = {"low": "physical", "mid": "physical", "high": "physical"}
         self.last_control_time = {"low": 0, "mid": 0, "high": 0}
         # Remove automatic timeout - digital control persists until physical movement
+        
+        # Number of updates per control source
+        self.update_counts = {source: 0 for source in self.UPDATE_SOURCES}
+        self.update_counts['other'] = 0
     
     def add_update_callback(self, callback):
         self.update_callbacks.append(callback)
     
+    def _count_update(self, source):
+        if source not in self.UPDATE_SOURCES:
+            source = 'other'
+        self.update_counts[source] += 1
+    
     def adc_to_db(self, raw):
         scaled = raw / 65535 * 4095
         db = -11.8 + (scaled / 4095 * 24.0)
@@ -32,6 +44,10 @@ class EQProcessor:
     def monitor_dials(self):
         """Monitor physical dials with last-controlled priority"""
         current = {band: self.adc[band].read_u16() for band in self.adc}
+        self.process_dials(current)
+    
+    def process_dials(self, current):
+        """Apply raw dial readings ({band: read_u16 value}), sampled here or on core 1"""
         updated = False
         current_time = time.ticks_ms()
 
@@ -70,6 +86,7 @@ class EQProcessor:
                 updated = True
 
         if updated:
+            self._count_update('physical')
             #print(f"[EQ] Current - Low: {self.live_db['low']:.1f} dB, Mid: {self.live_db['mid']:.1f} dB, High: {self.live_db['high']:.1f} dB")
             
             # Notify all callbacks with both EQ data and control source info
@@ -94,6 +111,8 @@ class EQProcessor:
                 self.last_control_source[band] = source
                 self.last_control_time[band] = time.ticks_ms()
                 
+                self._count_update(source)
+                
                 print(f"[EQ SET] {band}: {old_value:.1f} -> {new_value:.1f} dB ({source} control - persists until physical movement)")
                 
                 # Notify callbacks immediately with both EQ data and control source info
@@ -1,20 +1,28 @@
 from machine import Pin
 from lib.updebouncein.debounced_input import DebouncedInput
+import time
 
 class ButtonManager:
-    def __init__(self, button_config):
+    def __init__(self, button_config, use_irq=True, debounce_ms=4):
         self.callbacks = {}
         self.buttons = []
-        self._setup_buttons(button_config)
+        self.debounce_ms = debounce_ms
+        # Polling state (use_irq=False), per pin: pin, raw value, stable value, last change
+        self.polled = []
+        self._setup_buttons(button_config, use_irq)
     
-    def _setup_buttons(self, button_config):
+    def _setup_buttons(self, button_config, use_irq):
         for pin_number, callback in button_config.items():
             if callback:
                 self.callbacks[pin_number] = callback
+                if not use_irq:
+                    pin = Pin(pin_number, Pin.IN, Pin.PULL_DOWN)
+                    self.polled.append([pin_number, pin, 0, 0, 0])
+                    continue
                 button = DebouncedInput(
                     pin_number,
                     callback=self._handle_button_event,
-                    debounce_ms=4,
+                    debounce_ms=self.debounce_ms,
                     pin_logic_pressed=True,
                     pin_pull=Pin.PULL_DOWN
                 )
@@ -23,4 +31,22 @@ class ButtonManager:
     def _handle_button_event(self, pin_number, is_pressed, duration_ms):
         if is_pressed and pin_number in self.callbacks:
             print(f"[BUTTON] GP{pin_number} pressed")
-            self.callbacks[pin_number]()
\ No newline at end of file
+            self.callbacks[pin_number]()
+    
+    def poll(self, on_press):
+        """Debounce the polled buttons, calling on_press(pin_number) for each new press.
+        Only touches the pins, so it can run on core 1"""
+        now = time.ticks_ms()
+        for button in self.polled:
+            value = button[1].value()
+            if value != button[2]:
+                button[2] = value
+                button[4] = now
+            elif value != button[3] and time.ticks_diff(now, button[4]) >= self.debounce_ms:
+                button[3] = value
+                if value:
+                    on_press(button[0])
+    
+    def press(self, pin_number):
+        """Run the action of a button pressed on core 1"""
+        self._handle_button_event(pin_number, True, 0)
\ No newline at end of file
@@ -6,7 +6,7 @@ from model.websocket.web_socket_manager import WebSocketManager
 from model.audio.voice_mode_manager import VoiceModeManager
 
 class AudioModel:
-    def __init__(self):
+    def __init__(self, dual_core=False):
         # Initialize components
         self.led_manager = LEDManager()
         self.eq_processor = EQProcessor()
@@ -14,6 +14,9 @@ class AudioModel:
         self.ws_manager = WebSocketManager()
         self.voice_mode_manager = VoiceModeManager()
         
+        # Incremented on every state change, so serialized views of the state can be reused
+        self.state_version = 0
+        
         # Set up inter-component communication
         self._setup_callbacks()
         
@@ -24,12 +27,23 @@ class AudioModel:
             8: None,  # Reserved
             9: self.voice_mode_manager.toggle_mode
         }
-        self.button_manager = ButtonManager(button_config)
+        # With dual_core the buttons are polled from core 1 instead of using pin IRQs
+        self.button_manager = ButtonManager(button_config, use_irq=not dual_core)
         
         # Initial LED state
         self.led_manager.set_mode(self.voice_mode_manager.current_mode)
     
     def _setup_callbacks(self):
+        # Any change bumps the state version. These are registered first, so the
+        # version is bumped even if a later callback raises, otherwise cached
+        # snapshots of the old state would keep being served
+        self.voice_mode_manager.add_change_callback(self._state_changed)
+        self.voice_mode_manager.add_ducking_callback(self._state_changed)
+        self.voice_mode_manager.add_feedback_callback(self._state_changed)
+        self.voice_mode_manager.add_mute_callback(self._state_changed)
+        self.eq_processor.add_update_callback(self._state_changed)
+        self.uart_manager.add_update_callback(self._state_changed)
+        
         # Voice mode changes update LEDs and notify WebSocket clients
         self.voice_mode_manager.add_change_callback(self.led_manager.set_mode)
         self.voice_mode_manager.add_change_callback(self.ws_manager.broadcast_mode_change)
@@ -47,6 +61,9 @@ class AudioModel:
         # UART changes notify WebSocket clients
         self.uart_manager.add_update_callback(self.ws_manager.broadcast_uart_state)
     
+    def _state_changed(self, *args):
+        self.state_version += 1
+    
     @property
     def ws_clients(self):
         return self.ws_manager.clients
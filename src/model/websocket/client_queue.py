@@ -0,0 +1,125 @@
+import json
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+import time
+from lib.microdot.websocket import WebSocket
+
+DELTA = 'delta'  # key of the state delta waiting to be sent
+
+
+def merge_deltas(older, newer):
+    """Return a delta with the changes of two consecutive deltas. base is the
+    seq the merged delta applies on top of"""
+    merged = {}
+    for key, value in older.items():
+        merged[key] = dict(value) if isinstance(value, dict) else value
+    for key, value in newer.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key].update(value)
+        else:
+            merged[key] = value
+    merged['base'] = older.get('base', older['seq'] - 1)
+    return merged
+
+class ClientQueue:
+    """Bounded outgoing queue for one WebSocket client, drained by its own writer task.
+
+    Frames are keyed by topic: a frame for a topic that is still waiting to be
+    sent replaces the older one in place, so a client that falls behind gets
+    the latest value instead of every intermediate one. Frames without a topic
+    are always queued. State deltas are merged instead of replaced, as each one
+    may carry fields the others do not.
+    """
+
+    def __init__(self, manager, ws, max_size=8):
+        self.manager = manager
+        self.ws = ws
+        self.max_size = max_size
+        self.order = []  # keys in send order
+        self.frames = {}  # key -> frame
+        self.seq = 0  # keys for frames without a topic
+        self.delta = None  # the delta queued under DELTA
+        self.event = asyncio.Event()
+        self.full_since = None
+        self.closed = False
+        self.task = asyncio.create_task(self._writer())
+
+    def __len__(self):
+        return len(self.order)
+
+    def put(self, frame, topic=None):
+        """Queue a frame. Returns False if the client has been unable to keep up
+        for longer than the manager's stall timeout and should be disconnected"""
+        if topic is not None and topic in self.frames:
+            self.frames[topic] = frame
+            self.manager.frames_coalesced += 1
+            return True
+        if len(self.order) >= self.max_size:
+            self.manager.frames_dropped += 1
+            return not self._stalled()
+        if topic is None:
+            self.seq += 1
+            topic = self.seq
+        self.order.append(topic)
+        self.frames[topic] = frame
+        self.event.set()
+        return True
+    
+    def put_delta(self, frame, delta):
+        """Queue a state delta, given both encoded and as a dict. A delta that is
+        still waiting to be sent is merged with the new one, so deltas are never
+        dropped and the client does not miss a change. Returns False like put()"""
+        if DELTA in self.frames:
+            self.delta = merge_deltas(self.delta, delta)
+            self.frames[DELTA] = None  # encoded when it is sent
+            self.manager.frames_coalesced += 1
+            return True
+        # At most one delta is waiting, so it is queued even over the limit
+        ok = len(self.order) < self.max_size or not self._stalled()
+        self.order.append(DELTA)
+        self.frames[DELTA] = frame
+        self.delta = delta
+        self.event.set()
+        return ok
+    
+    def _stalled(self):
+        """Note that the queue is full; True once it has been full for longer
+        than the manager's stall timeout"""
+        now = time.ticks_ms()
+        if self.full_since is None:
+            self.full_since = now
+            return False
+        return time.ticks_diff(now, self.full_since) > self.manager.stall_timeout * 1000
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.order:
+                    if self.closed:
+                        return
+                    self.event.clear()
+                    await self.event.wait()
+                key = self.order.pop(0)
+                frame = self.frames.pop(key)
+                if key == DELTA:
+                    if frame is None:
+                        frame = WebSocket.encode_frame(json.dumps(self.delta))
+                    self.delta = None
+                self.full_since = None
+                await asyncio.wait_for(self.ws.send_frame(frame), self.manager.send_timeout)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Write failed or timed out
+            if not self.closed:
+                self.manager.disconnect_client(self.ws)
+
+    def close(self):
+        """Stop the writer task and discard the queued frames"""
+        self.closed = True
+        self.order = []
+        self.frames = {}
+        self.delta = None
+        self.event.set()
@@ -1,33 +1,135 @@
 import json
-import uasyncio as asyncio
+import time
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+from lib.microdot.websocket import WebSocket
+from model.websocket.client_queue import ClientQueue
 
 class WebSocketManager:
-    def __init__(self):
-        self.clients = set()
+    def __init__(self, history_size=16, queue_size=8, send_timeout=5, stall_timeout=5, eq_interval_ms=33):
+        # WebSocket -> ClientQueue, each client has a bounded queue and its own writer task
+        self.clients = {}
+        self.sse_clients = set()
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout  # seconds for one frame write
+        self.stall_timeout = stall_timeout  # seconds a client may stay over its queue limit
+        # Recent broadcasts, kept so that SSE clients can resume after a reconnect
+        self.event_id = 0
+        self.history = []
+        self.history_size = history_size
+        # State changes are sent as deltas numbered by seq, clients that miss
+        # one ask for a snapshot. sent_state holds the values last broadcast
+        # for each group of fields ('eq', 'control_sources', 'uart')
+        self.seq = 0
+        self.sent_state = {}
+        # EQ updates are sent at most once per eq_interval_ms, the latest one
+        # received in between is held in eq_pending until the interval ends
+        self.eq_interval_ms = eq_interval_ms
+        self.eq_pending = None
+        self.eq_last_sent = None
+        # Message counters, for metrics
+        self.messages_sent = 0
+        self.messages_received = 0
+        self.frames_coalesced = 0
+        self.frames_dropped = 0
+        self.clients_disconnected = 0
+        self.eq_updates_merged = 0
     
     def add_client(self, ws):
-        self.clients.add(ws)
+        self.clients[ws] = ClientQueue(self, ws, self.queue_size)
     
     def remove_client(self, ws):
-        self.clients.discard(ws)
+        queue = self.clients.pop(ws, None)
+        if queue is not None:
+            queue.close()
+    
+    def disconnect_client(self, ws):
+        """Drop a client that cannot keep up, closing its connection"""
+        if ws not in self.clients:
+            return
+        self.remove_client(ws)
+        self.clients_disconnected += 1
+        print("[WS] Disconnecting slow client")
+        asyncio.create_task(self._close_connection(ws))
+    
+    async def _close_connection(self, ws):
+        ws.closed = True
+        try:
+            # Closing the stream also ends the handler's receive loop
+            await ws.request.sock[1].aclose()
+        except Exception:
+            pass
+    
+    def queue_depths(self):
+        """Return (total, max) frames waiting in the client queues"""
+        total = 0
+        largest = 0
+        for queue in self.clients.values():
+            depth = len(queue)
+            total += depth
+            if depth > largest:
+                largest = depth
+        return total, largest
+    
+    def add_sse_client(self, sse):
+        self.sse_clients.add(sse)
+    
+    def remove_sse_client(self, sse):
+        self.sse_clients.discard(sse)
+    
+    def events_since(self, last_event_id):
+        """Return the (event_id, message) broadcasts after last_event_id,
+        or None if they are no longer available and the client needs a full state"""
+        try:
+            last_event_id = int(last_event_id)
+        except (TypeError, ValueError):
+            return None
+        if last_event_id > self.event_id:
+            # IDs from before a restart
+            return None
+        if last_event_id < self.event_id - len(self.history):
+            return None
+        return [event for event in self.history if event[0] > last_event_id]
     
     def broadcast_mode_change(self, mode):
-        msg = json.dumps({"type": "mode", "mode": mode})
-        self._broadcast(msg)
+        self._broadcast_delta({"mode": mode})
     
     def broadcast_ducking_change(self, enabled):
-        msg = json.dumps({"type": "ducking", "enabled": enabled})
-        self._broadcast(msg)
+        self._broadcast_delta({"ducking": enabled})
     
     def broadcast_feedback_change(self, enabled):
-        msg = json.dumps({"type": "feedback", "enabled": enabled})
-        self._broadcast(msg)
+        self._broadcast_delta({"feedback": enabled})
     
     def broadcast_mute_change(self, enabled):
-        msg = json.dumps({"type": "mute", "enabled": enabled})
-        self._broadcast(msg)
+        self._broadcast_delta({"mute": enabled})
     
     def broadcast_eq_update(self, callback_data):
+        """Send an EQ update, at most one per eq_interval_ms. Updates that arrive
+        sooner are merged and the latest one is sent when the interval ends"""
+        if self.eq_pending is not None:
+            # A trailing update is already scheduled, it will carry this one
+            self.eq_pending = callback_data
+            self.eq_updates_merged += 1
+            return
+        now = time.ticks_ms()
+        if self.eq_last_sent is not None:
+            elapsed = time.ticks_diff(now, self.eq_last_sent)
+            if elapsed < self.eq_interval_ms:
+                self.eq_pending = callback_data
+                asyncio.create_task(self._flush_eq_update(self.eq_interval_ms - elapsed))
+                return
+        self._send_eq_update(callback_data, now)
+    
+    async def _flush_eq_update(self, delay_ms):
+        await asyncio.sleep(delay_ms / 1000)
+        callback_data = self.eq_pending
+        self.eq_pending = None
+        self._send_eq_update(callback_data, time.ticks_ms())
+    
+    def _send_eq_update(self, callback_data, now):
+        self.eq_last_sent = now
         # Handle both old format (just eq data) and new format (eq + control sources)
         if isinstance(callback_data, dict) and 'eq' in callback_data:
             eq_data = callback_data['eq']
@@ -37,26 +139,72 @@ class WebSocketManager:
             eq_data = callback_data
             control_sources = {}
         
-        msg = json.dumps({
-            "type": "dial",
-            "low": eq_data["low"],
-            "mid": eq_data["mid"],
-            "high": eq_data["high"],
-            "control_sources": control_sources
-        })
-        self._broadcast(msg)
+        delta = {}
+        self._add_changes(delta, "eq", eq_data)
+        self._add_changes(delta, "control_sources", control_sources)
+        if delta:
+            self._broadcast_delta(delta)
     
     def broadcast_uart_state(self, uart_state):
-        msg = json.dumps({"type": "uart_state_update", "state": uart_state})
-        self._broadcast(msg)
+        delta = {}
+        self._add_changes(delta, "uart", uart_state)
+        if delta:
+            self._broadcast_delta(delta)
+    
+    def _add_changes(self, delta, group, values):
+        """Add the fields of a group that changed since it was last broadcast to delta"""
+        sent = self.sent_state.get(group)
+        if sent is None:
+            sent = self.sent_state[group] = {}
+        changes = {}
+        for key, value in values.items():
+            if key not in sent or sent[key] != value:
+                changes[key] = value
+                sent[key] = value
+        if changes:
+            delta[group] = changes
     
-    def broadcast(self, message):
-        """Generic broadcast method for custom messages"""
-        self._broadcast(message)
+    def _broadcast_delta(self, delta):
+        self.seq += 1
+        delta["type"] = "delta"
+        delta["seq"] = self.seq
+        # A client that falls behind gets its queued deltas merged into one
+        self._broadcast(json.dumps(delta), delta=delta)
     
-    def _broadcast(self, message):
-        for ws in list(self.clients):
+    def broadcast(self, message, topic=None):
+        """Generic broadcast method for custom messages. Queued messages with
+        the same topic are replaced by the newest one"""
+        self._broadcast(message, topic)
+    
+    def _broadcast(self, message, topic=None, delta=None):
+        self.messages_sent += len(self.clients) + len(self.sse_clients)
+        if self.clients:
+            # Encode the frame once and queue the same bytes for every client
+            frame = WebSocket.encode_frame(message)
+            stalled = None
+            for ws, queue in self.clients.items():
+                if delta is not None:
+                    ok = queue.put_delta(frame, delta)
+                else:
+                    ok = queue.put(frame, topic)
+                if not ok:
+                    stalled = stalled or []
+                    stalled.append(ws)
+            if stalled:
+                for ws in stalled:
+                    self.disconnect_client(ws)
+        
+        self.event_id += 1
+        self.history.append((self.event_id, message))
+        if len(self.history) > self.history_size:
+            self.history.pop(0)
+        for sse in list(self.sse_clients):
             try:
-                asyncio.create_task(ws.send(message))
-            except:
-                self.clients.discard(ws)
\ No newline at end of file
+                # Queued directly, the SSE response writes it out
+                sse.send_nowait(message, event_id=self.event_id)
+            except Exception:
+                self.sse_clients.discard(sse)
+                continue
+            if sse.overflowed:
+                # The stream has ended, the client reconnects and catches up
+                self.sse_clients.discard(sse)
@@ -12,23 +12,23 @@ export default class AudioDashboardApp {
     this.modeManager = null;
     this.uartController = null;
 
+    // Sequence number of the last state delta applied, null until a snapshot arrives
+    this.seq = null;
+    this.resyncRequested = false;
+
     this.init();
   }
 
   init() {
     // Initialize WebSocket with callbacks
     this.wsManager = new WebSocketManager(`ws://${location.host}/ws`, {
-      dial: (message) => this.handleDialUpdate(message),
-      mode: (message) => this.handleModeUpdate(message),
-      ducking: (message) => this.handleDuckingUpdate(message),
-      feedback: (message) => this.handleFeedbackUpdate(message),
-      mute: (message) => this.handleMuteUpdate(message),
+      delta: (message) => this.handleDelta(message),
       uart_command: (message) => this.handleUARTCommandUpdate(message),
-      uart_state_update: (message) =>
-        this.uartController.handleStateUpdate(message.state),
       initial_state: (message) => this.handleInitialState(message),
       onOpen: () => {
         // Don't request initial data - server sends it automatically
+        this.seq = null;
+        this.resyncRequested = false;
       },
       onClose: () => {},
       onError: (error) => console.error("Dashboard WebSocket error:", error),
@@ -54,6 +54,12 @@ export default class AudioDashboardApp {
 
   // Add this new method to handle initial state
   handleInitialState(message) {
+    // Snapshots sent on connect and on resync include every delta up to their seq
+    if (message.seq !== undefined) {
+      this.seq = message.seq;
+      this.resyncRequested = false;
+    }
+
     // Update mode first
     if (this.modeManager && message.mode) {
       this.modeManager.updateMode(message.mode);
@@ -85,6 +91,58 @@ export default class AudioDashboardApp {
     }
   }
 
+  handleDelta(message) {
+    // Ignore deltas until the snapshot arrives, and those it already includes
+    if (this.seq === null || message.seq <= this.seq) {
+      return;
+    }
+
+    // A delta was missed, the state can only be recovered from a snapshot.
+    // Deltas merged on the server apply on top of base instead of seq - 1,
+    // their fields hold absolute values so reapplying some of them is harmless
+    const base = message.base !== undefined ? message.base : message.seq - 1;
+    if (base > this.seq) {
+      this.requestResync();
+      return;
+    }
+    this.seq = message.seq;
+
+    if (message.mode !== undefined) {
+      this.handleModeUpdate(message);
+    }
+
+    if (message.ducking !== undefined) {
+      this.updateDuckingDisplay(message.ducking);
+    }
+
+    if (message.feedback !== undefined) {
+      this.updateFeedbackDisplay(message.feedback);
+    }
+
+    if (message.mute !== undefined) {
+      this.updateMuteDisplay(message.mute);
+    }
+
+    // Only the bands that changed are present
+    if (message.eq || message.control_sources) {
+      this.handleDialUpdate({
+        ...message.eq,
+        control_sources: message.control_sources,
+      });
+    }
+
+    if (this.uartController && message.uart) {
+      this.uartController.handleStateUpdate(message.uart);
+    }
+  }
+
+  requestResync() {
+    if (!this.resyncRequested) {
+      this.resyncRequested = true;
+      this.wsManager.send({ action: "resync", seq: this.seq });
+    }
+  }
+
   handleDialUpdate(message) {
     if (this.eqController) {
       this.eqController.updateFromServer({
@@ -127,18 +185,6 @@ export default class AudioDashboardApp {
     }
   }
 
-  handleDuckingUpdate(message) {
-    this.updateDuckingDisplay(message.enabled);
-  }
-
-  handleFeedbackUpdate(message) {
-    this.updateFeedbackDisplay(message.enabled);
-  }
-
-  handleMuteUpdate(message) {
-    this.updateMuteDisplay(message.enabled);
-  }
-
   updateDuckingDisplay(enabled) {
     const duckingDisplay = document.getElementById("musicDucking");
     if (duckingDisplay) {
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the application is laid out for the MicroPython filesystem, where both
+# the source directory and its lib subdirectory are in the import path
+ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')
+for path in (ROOT, os.path.join(ROOT, 'lib')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
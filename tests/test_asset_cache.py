@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from microdot import Response
+from microdot.asset_cache import AssetCache
+
+
+class TestAssetCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, data):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_hit_and_miss(self):
+        cache = AssetCache(max_size=100)
+        path = self.write('a.txt', b'hello')
+        self.assertEqual(cache.fetch(path, 1), b'hello')
+        self.assertEqual(cache.fetch(path, 1), b'hello')
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.size, 5)
+
+    def test_too_large(self):
+        cache = AssetCache(max_size=100, max_item_size=4)
+        path = self.write('a.txt', b'hello')
+        self.assertIsNone(cache.fetch(path))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_eviction(self):
+        cache = AssetCache(max_size=10)
+        a = self.write('a.txt', b'aaaa')
+        b = self.write('b.txt', b'bbbb')
+        c = self.write('c.txt', b'cccc')
+        cache.fetch(a)
+        cache.fetch(b)
+        cache.fetch(a)  # b is now the least recently used
+        cache.fetch(c)
+        self.assertEqual(list(cache.entries), [a, c])
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidation(self):
+        cache = AssetCache(max_size=100)
+        path = self.write('a.txt', b'old')
+        self.assertEqual(cache.fetch(path, 'v1'), b'old')
+        self.write('a.txt', b'new data')
+        self.assertEqual(cache.fetch(path, 'v1'), b'old')
+        self.assertEqual(cache.fetch(path, 'v2'), b'new data')
+        self.assertEqual(cache.size, 8)
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_send_file_after_change(self):
+        self.addCleanup(setattr, Response, 'send_file_cache',
+                        Response.send_file_cache)
+        Response.send_file_cache = AssetCache(max_size=100)
+        path = self.write('a.txt', b'old contents')
+        res = Response.send_file(path)
+        self.assertEqual(res.body, b'old contents')
+        self.write('a.txt', b'contents that are longer now')
+        res = Response.send_file(path)
+        self.assertEqual(res.headers['Content-Length'], '28')
+        self.assertEqual(res.body, b'contents that are longer now')
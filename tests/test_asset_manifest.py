@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+import unittest
+
+from microdot.asset_manifest import AssetManifest
+
+ENTRY = {'file': 'static/app.js.gz', 'size': 10, 'etag': '"abc"',
+         'content_type': 'text/javascript', 'encoding': 'gzip'}
+
+
+class TestAssetManifest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'asset-manifest.json')
+
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+    def test_load(self):
+        self.write(json.dumps({'/static/app.js': ENTRY}))
+        asset = AssetManifest.load(self.path).get('/static/app.js')
+        self.assertEqual(asset.path, 'static/app.js.gz')
+        self.assertEqual(asset.etag, '"abc"')
+
+    def test_missing_file(self):
+        with self.assertRaises(OSError):
+            AssetManifest.load(self.path)
+
+    def test_invalid_manifest(self):
+        for text in ('{"/static/app.js": {"file": "a', '[]',
+                     '{"/static/app.js": "static/app.js"}'):
+            self.write(text)
+            with self.assertRaises(ValueError):
+                AssetManifest.load(self.path)
+
+    def test_incomplete_entry(self):
+        entry = dict(ENTRY)
+        del entry['etag']
+        self.write(json.dumps({'/static/app.js': entry}))
+        with self.assertRaises(KeyError):
+            AssetManifest.load(self.path)
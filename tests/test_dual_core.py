@@ -0,0 +1,117 @@
+import importlib.util
+import os
+import time
+import unittest
+
+# loaded by path, as importing the app package needs the MicroPython modules
+# that its other submodules use
+spec = importlib.util.spec_from_file_location('dual_core', os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'src', 'app', 'dual_core.py'))
+dual_core = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dual_core)
+MessageQueue = dual_core.MessageQueue
+DualCoreWorker = dual_core.DualCoreWorker
+
+
+class FakeADC:
+    def __init__(self, value):
+        self.value = value
+
+    def read_u16(self):
+        return self.value
+
+
+class FakeEQProcessor:
+    deadzone = 300
+
+    def __init__(self):
+        self.adc = {'low': FakeADC(1000), 'mid': FakeADC(2000),
+                    'high': FakeADC(3000)}
+        self.processed = []
+
+    def process_dials(self, current):
+        self.processed.append(current)
+
+
+class FakeButtonManager:
+    def __init__(self):
+        self.pending = [6, 9]
+        self.pressed = []
+
+    def poll(self, on_press):
+        while self.pending:
+            on_press(self.pending.pop(0))
+
+    def press(self, pin_number):
+        self.pressed.append(pin_number)
+
+
+class FakeModel:
+    def __init__(self):
+        self.eq_processor = FakeEQProcessor()
+        self.button_manager = FakeButtonManager()
+
+
+class FakeUARTService:
+    def __init__(self):
+        self.queue = None
+        self.written = []
+
+    def send_command(self, param, value):
+        if self.queue is not None:
+            self.queue.put((param, value))
+        else:
+            self.write_command(param, value)
+
+    def write_command(self, param, value):
+        self.written.append((param, value))
+
+
+class TestMessageQueue(unittest.TestCase):
+    def test_fifo_with_wraparound(self):
+        queue = MessageQueue(3)
+        received = []
+        for i in range(10):
+            self.assertTrue(queue.put(i))
+            if i % 2:
+                received.append(queue.get())
+                received.append(queue.get())
+        self.assertEqual(received, list(range(10)))
+        self.assertIsNone(queue.get())
+        self.assertEqual(queue.count, 0)
+
+    def test_overflow(self):
+        queue = MessageQueue(2)
+        self.assertTrue(queue.put('a'))
+        self.assertTrue(queue.put('b'))
+        self.assertFalse(queue.put('c'))
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.get(), 'a')
+        self.assertTrue(queue.put('d'))
+        self.assertEqual(queue.get(), 'b')
+        self.assertEqual(queue.get(), 'd')
+        self.assertIsNone(queue.get())
+
+
+class TestDualCoreWorker(unittest.TestCase):
+    def test_worker_thread(self):
+        model = FakeModel()
+        uart = FakeUARTService()
+        worker = DualCoreWorker(model, uart, interval_ms=1, queue_size=4)
+        worker.start()
+        try:
+            uart.send_command('bl', 1.5)
+            for _ in range(100):
+                if uart.written and worker.dials_pending and \
+                        worker.presses.count == 2:
+                    break
+                time.sleep(0.01)
+            worker.dispatch_events()
+        finally:
+            worker.stop()
+        self.assertTrue(worker.stopped)
+        self.assertIsNone(uart.queue)
+        self.assertEqual(uart.written, [('bl', 1.5)])
+        self.assertEqual(model.eq_processor.processed,
+                         [{'low': 1000, 'mid': 2000, 'high': 3000}])
+        self.assertEqual(model.button_manager.pressed, [6, 9])
@@ -0,0 +1,338 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from microdot import Microdot, Request, Response
+from microdot.websocket import with_websocket
+
+
+async def start(app):
+    task = asyncio.ensure_future(app.start_server(host='127.0.0.1', port=0))
+    while app.server is None or not app.server.sockets:
+        await asyncio.sleep(0.01)
+    return task, app.server.sockets[0].getsockname()[1]
+
+
+async def stop(app, task):
+    app.shutdown()
+    await task
+
+
+async def slow_get(port, path):
+    """Send a GET request and read the response a little at a time."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write('GET {} HTTP/1.0\r\n\r\n'.format(path).encode())
+    await writer.drain()
+    data = b''
+    while True:
+        chunk = await reader.read(64 * 1024)
+        if not chunk:
+            break
+        data += chunk
+        await asyncio.sleep(0.001)
+    writer.close()
+    head, body = data.split(b'\r\n\r\n', 1)
+    return head, body
+
+
+async def request(port, path, headers=''):
+    """Send a GET request on a new connection and return the connection
+    with the status line of the response."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write('GET {} HTTP/1.1\r\n{}\r\n'.format(path, headers).encode())
+    await writer.drain()
+    status = await asyncio.wait_for(reader.readline(), 2)
+    return reader, writer, status
+
+
+def pattern(size):
+    """Return bytes whose content changes from block to block, so that any
+    block that is sent twice or in the wrong place is detected."""
+    blocks = []
+    for i in range(size // 8):
+        blocks.append(b'%08x' % i)
+    return b''.join(blocks)
+
+
+class TestMicrodot(unittest.TestCase):
+    size = 8 * 1024 * 1024
+
+    def test_large_bodies_to_slow_reader(self):
+        expected = pattern(self.size)
+        fd, filename = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(expected)
+        self.addCleanup(os.remove, filename)
+
+        app = Microdot()
+
+        @app.route('/file')
+        async def file(request):
+            return Response.send_file(filename,
+                                      content_type='application/octet-stream')
+
+        @app.route('/generator')
+        async def generator(request):
+            def body():
+                for i in range(0, self.size, 1000):
+                    yield expected[i:i + 1000]
+
+            return body()
+
+        async def main():
+            task, port = await start(app)
+            try:
+                for path in ('/file', '/generator'):
+                    head, body = await slow_get(port, path)
+                    self.assertIn(b'200', head.split(b'\r\n')[0])
+                    self.assertEqual(len(body), len(expected))
+                    self.assertTrue(body == expected, path)
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_idle_keep_alive_connection_releases_slot(self):
+        app = Microdot()
+        app.keep_alive = True
+        app.max_connections = 1
+        app.connection_wait_timeout = 1
+
+        @app.route('/')
+        async def index(request):
+            return 'hello'
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer, status = await request(port, '/')
+                self.assertIn(b'200', status)
+                await reader.readuntil(b'hello')
+                _, writer2, status = await request(port, '/')
+                self.assertIn(b'200', status)
+                writer2.close()
+
+                # the idle connection can still be used
+                writer.write(b'GET / HTTP/1.1\r\n\r\n')
+                status = await asyncio.wait_for(reader.readline(), 2)
+                self.assertIn(b'200', status)
+                writer.close()
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_websocket_releases_slot(self):
+        app = Microdot()
+        app.max_connections = 1
+        app.connection_wait_timeout = 1
+
+        @app.route('/')
+        async def index(request):
+            return 'hello'
+
+        @app.route('/ws')
+        @with_websocket
+        async def ws(request, ws):
+            await ws.receive()
+
+        async def main():
+            task, port = await start(app)
+            try:
+                _, ws_writer, status = await request(
+                    port, '/ws', 'Connection: Upgrade\r\n'
+                    'Upgrade: websocket\r\n'
+                    'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n')
+                self.assertIn(b'101', status)
+                self.assertEqual(app.active_connections, 0)
+                _, writer, status = await request(port, '/')
+                self.assertIn(b'200', status)
+                writer.close()
+                ws_writer.close()
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_wait_for_slot_times_out(self):
+        app = Microdot()
+        app.max_connections = 1
+        app.connection_wait_timeout = 0.2
+        done = asyncio.Event()
+
+        @app.route('/slow')
+        async def slow(request):
+            await done.wait()
+            return 'done'
+
+        @app.route('/')
+        async def index(request):
+            return 'hello'
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(b'GET /slow HTTP/1.0\r\n\r\n')
+                await writer.drain()
+                while app.active_connections == 0:
+                    await asyncio.sleep(0.01)
+                _, writer2, status = await request(port, '/')
+                self.assertIn(b'503', status)
+                self.assertEqual(app.rejected_connections, 1)
+                writer2.close()
+                done.set()
+                status = await asyncio.wait_for(reader.readline(), 2)
+                self.assertIn(b'200', status)
+                writer.close()
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_request_attributes_and_url_parsers(self):
+        app = Microdot()
+
+        @app.before_request
+        async def authenticate(request):
+            request.user = 'susan'
+
+        @app.route('/items/<int:id>')
+        async def item(request, id):
+            return '{} {}'.format(request.user, id + 1)
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(b'GET /items/41 HTTP/1.0\r\n\r\n')
+                await writer.drain()
+                data = await asyncio.wait_for(reader.read(), 2)
+                writer.close()
+                self.assertTrue(data.endswith(b'\r\n\r\nsusan 42'))
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_keep_alive_timeout_only_applies_while_idle(self):
+        app = Microdot()
+        app.keep_alive = True
+        app.keep_alive_timeout = 0.2
+
+        @app.route('/', methods=['GET', 'POST'])
+        async def index(request):
+            return 'got ' + request.body.decode()
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer, status = await request(port, '/')
+                self.assertIn(b'200', status)
+                await reader.readuntil(b'got ')
+
+                # a slow upload on the reused connection is not cut off
+                writer.write(b'POST / HTTP/1.1\r\nContent-Length: 4\r\n\r\n')
+                for c in b'data':
+                    await asyncio.sleep(0.1)
+                    writer.write(bytes([c]))
+                status = await asyncio.wait_for(reader.readline(), 2)
+                self.assertIn(b'200', status)
+                await reader.readuntil(b'got data')
+                self.assertEqual(app.reaped_connections, 0)
+
+                # a malformed request gets a 400 response
+                writer.write(b'GET /\r\n\r\n')
+                status = await asyncio.wait_for(reader.readline(), 2)
+                self.assertIn(b'400', status)
+                writer.close()
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_chunked_body_over_max_content_length(self):
+        self.addCleanup(setattr, Request, 'max_content_length',
+                        Request.max_content_length)
+        Request.max_content_length = 10
+        app = Microdot()
+
+        @app.post('/')
+        async def index(request):
+            return await request.stream.read()
+
+        async def post(port, chunks):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST / HTTP/1.1\r\n'
+                         b'Transfer-Encoding: chunked\r\n\r\n')
+            for chunk in chunks:
+                writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(), 2)
+            writer.close()
+            return data
+
+        async def main():
+            task, port = await start(app)
+            try:
+                data = await post(port, [b'12345', b'67890'])
+                self.assertIn(b'200', data.split(b'\r\n')[0])
+                self.assertTrue(data.endswith(b'1234567890'))
+                data = await post(port, [b'12345', b'67890', b'x'])
+                self.assertIn(b'413', data.split(b'\r\n')[0])
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_waiters_do_not_exceed_connection_limit(self):
+        app = Microdot()
+        app.max_connections = 1
+        app.connection_wait_timeout = 1
+
+        async def main():
+            self.assertTrue(await app.acquire_connection())
+            waiters = [asyncio.ensure_future(app.acquire_connection())
+                       for _ in range(3)]
+            await asyncio.sleep(0.05)
+            self.assertEqual(app.waiting_connections, 3)
+            for admitted in range(1, 4):
+                app.release_connection()
+                await asyncio.sleep(0.05)
+                self.assertEqual(app.active_connections, 1)
+                self.assertEqual(sum(w.done() for w in waiters), admitted)
+            self.assertTrue(all(w.result() for w in waiters))
+            self.assertEqual(app.waiting_connections, 0)
+
+        asyncio.run(main())
+
+    def test_slow_chunked_body_times_out(self):
+        app = Microdot()
+        app.body_timeout = 0.2
+
+        @app.post('/')
+        async def index(request):
+            return await request.stream.read()
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(b'POST / HTTP/1.1\r\n'
+                             b'Transfer-Encoding: chunked\r\n\r\n'
+                             b'5\r\nhello\r\n')
+                await writer.drain()
+                # the rest of the body never arrives
+                data = await asyncio.wait_for(reader.read(), 2)
+                writer.close()
+                self.assertIn(b'408', data.split(b'\r\n')[0])
+                self.assertEqual(app.reaped_connections, 1)
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
@@ -0,0 +1,85 @@
+import unittest
+
+from microdot.microdot import NoCaseDict, RequestHeaders
+
+LINES = [
+    b'Host: 192.168.4.1',
+    b'Content-Type: text/plain',
+    b'Accept-Encoding: gzip, deflate',
+    b'X-Empty:',
+]
+
+
+class TestRequestHeaders(unittest.TestCase):
+    def test_lookup_is_case_insensitive(self):
+        headers = RequestHeaders(LINES)
+        self.assertEqual(headers['host'], '192.168.4.1')
+        self.assertEqual(headers.get('ACCEPT-ENCODING'), 'gzip, deflate')
+        self.assertEqual(headers.get('X-Empty'), '')
+        self.assertIsNone(headers.get('Range'))
+        self.assertEqual(headers.get('Range', 'x'), 'x')
+        self.assertIn('content-type', headers)
+        self.assertNotIn('Range', headers)
+        with self.assertRaises(KeyError):
+            headers['Range']
+
+    def test_later_duplicate_wins(self):
+        headers = RequestHeaders([b'X-A: 1', b'x-a: 2'])
+        self.assertEqual(headers['X-A'], '2')
+        self.assertEqual(len(headers), 1)
+
+    def test_invalid_line(self):
+        with self.assertRaises(ValueError):
+            RequestHeaders([b'no colon here'])
+
+    def test_all_headers(self):
+        headers = RequestHeaders(LINES)
+        headers.get('Host')
+        self.assertEqual(len(headers), 4)
+        self.assertEqual(sorted(headers), ['Accept-Encoding', 'Content-Type',
+                                           'Host', 'X-Empty'])
+        self.assertEqual(dict(headers.items()), {
+            'Host': '192.168.4.1',
+            'Content-Type': 'text/plain',
+            'Accept-Encoding': 'gzip, deflate',
+            'X-Empty': '',
+        })
+        self.assertEqual(sorted(headers.values()),
+                         ['', '192.168.4.1', 'gzip, deflate', 'text/plain'])
+
+    def test_copy(self):
+        headers = RequestHeaders(LINES)
+        copy = headers.copy()
+        self.assertIsInstance(copy, NoCaseDict)
+        self.assertEqual(len(copy), 4)
+        self.assertEqual(copy['content-type'], 'text/plain')
+        copy['Host'] = 'example.com'
+        self.assertEqual(headers['Host'], '192.168.4.1')
+
+    def test_pop(self):
+        headers = RequestHeaders(LINES)
+        self.assertEqual(headers.pop('content-type'), 'text/plain')
+        self.assertNotIn('Content-Type', headers)
+        self.assertIsNone(headers.pop('Content-Type', None))
+        with self.assertRaises(KeyError):
+            headers.pop('Content-Type')
+        self.assertEqual(len(headers), 3)
+
+    def test_set_and_delete(self):
+        headers = RequestHeaders(LINES)
+        headers['HOST'] = 'example.com'
+        del headers['x-empty']
+        self.assertEqual(headers['host'], 'example.com')
+        self.assertEqual(len(headers), 3)
+        self.assertEqual(headers.setdefault('host', 'x'), 'example.com')
+        self.assertEqual(headers.setdefault('Range', 'bytes=0-'), 'bytes=0-')
+        self.assertEqual(headers['range'], 'bytes=0-')
+
+    def test_repr_and_equality(self):
+        headers = RequestHeaders(LINES[:2])
+        expected = {'Host': '192.168.4.1', 'Content-Type': 'text/plain'}
+        self.assertEqual(repr(headers), repr(expected))
+        self.assertEqual(str(RequestHeaders(LINES[:2])), str(expected))
+        self.assertEqual(RequestHeaders(LINES[:2]), expected)
+        self.assertFalse(RequestHeaders(LINES[:2]) != expected)
+        self.assertNotEqual(RequestHeaders(LINES), expected)
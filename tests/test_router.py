@@ -0,0 +1,85 @@
+import random
+import unittest
+
+from microdot import Microdot
+
+
+class FakeRequest:
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.url_args = None
+        self.url_pattern = None
+
+
+def naive_find_route(app, method, path):
+    """Match the routes one by one in the order they were registered, as
+    Microdot did before the routing table was indexed"""
+    f = 404
+    for route_methods, route_pattern, route_handler, _, _ in app.url_map:
+        url_args = route_pattern.match(path)
+        if url_args is not None:
+            if method in route_methods:
+                return route_handler, url_args
+            f = 405
+    return f, None
+
+
+SEGMENTS = ['api', 'static', 'users', 'eq', 'status', '<name>', '<int:id>',
+            '<path:rest>']
+PATHS = ['api', 'static', 'users', 'eq', 'status', 'other', '42', '-1',
+         'a.js']
+
+
+class TestRouter(unittest.TestCase):
+    def test_index_matches_naive_routing(self):
+        rng = random.Random(2024)
+        for _ in range(200):
+            app = Microdot()
+            for n in range(rng.randint(1, 12)):
+                segments = [rng.choice(SEGMENTS)
+                            for _ in range(rng.randint(0, 3))]
+                pattern = '/' + '/'.join(segments)
+                if '<path:rest>' in segments[:-1]:
+                    continue
+                methods = rng.sample(['GET', 'POST'], rng.randint(1, 2))
+
+                def handler(request, n=n):
+                    return n
+
+                app.route(pattern, methods=methods)(handler)
+
+            for _ in range(30):
+                path = '/' + '/'.join(rng.choice(PATHS)
+                                      for _ in range(rng.randint(0, 4)))
+                method = rng.choice(['GET', 'POST'])
+                req = FakeRequest(method, path)
+                f, _, _ = app.find_route(req)
+                expected, url_args = naive_find_route(app, method, path)
+                if callable(expected):
+                    self.assertIs(f, expected, (method, path))
+                    self.assertEqual(req.url_args, url_args)
+                else:
+                    self.assertEqual(f, expected, (method, path))
+
+    def test_routes_added_after_first_request(self):
+        app = Microdot()
+
+        @app.route('/<name>')
+        def name(request, name):
+            pass
+
+        req = FakeRequest('GET', '/status')
+        self.assertIs(app.find_route(req)[0], name)
+
+        @app.route('/status')
+        def status(request):
+            pass
+
+        @app.route('/eq')
+        def eq(request):
+            pass
+
+        # the dynamic route was registered first and still takes precedence
+        self.assertIs(app.find_route(FakeRequest('GET', '/status'))[0], name)
+        self.assertEqual(app.find_route(FakeRequest('POST', '/eq'))[0], 405)
@@ -0,0 +1,205 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+
+from microdot import Microdot, Response
+from microdot.asset_cache import AssetCache
+
+from tests.test_microdot import pattern, start, stop
+
+
+async def fetch(port, path, headers=''):
+    """Send a request and return the status code, the headers and the body
+    of the response."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write('GET {} HTTP/1.0\r\n{}\r\n'.format(path, headers).encode())
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), 2)
+    writer.close()
+    head, body = data.split(b'\r\n\r\n', 1)
+    lines = head.decode().split('\r\n')
+    response_headers = {}
+    for line in lines[1:]:
+        name, value = line.split(':', 1)
+        response_headers[name.lower()] = value.strip()
+    return int(lines[0].split()[1]), response_headers, body
+
+
+class TestSendFile(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.data = pattern(4096)
+        self.path = os.path.join(self.dir.name, 'data.txt')
+        with open(self.path, 'wb') as f:
+            f.write(self.data)
+
+        self.gzipped = gzip.compress(self.data)
+        for name in ('page.html.gz', 'only.js.gz'):
+            with open(os.path.join(self.dir.name, name), 'wb') as f:
+                f.write(self.gzipped)
+        with open(os.path.join(self.dir.name, 'page.html'), 'wb') as f:
+            f.write(self.data)
+
+        self.app = Microdot()
+
+        @self.app.route('/data')
+        async def data(request):
+            return Response.send_file(self.path, request=request)
+
+        @self.app.route('/<name>')
+        async def compressed(request, name):
+            return Response.send_file(
+                os.path.join(self.dir.name, name), file_extension='.gz',
+                compressed=True, request=request)
+
+    def run_requests(self, requests):
+        """Send each (path, headers) request to the application in turn and
+        return their responses."""
+        async def main():
+            task, port = await start(self.app)
+            try:
+                return [await fetch(port, path, headers)
+                        for path, headers in requests]
+            finally:
+                await stop(self.app, task)
+
+        return asyncio.run(main())
+
+    def test_not_modified(self):
+        (status, headers, body), = self.run_requests([('/data', '')])
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.data)
+        etag = headers['etag']
+        last_modified = headers['last-modified']
+
+        responses = self.run_requests([
+            ('/data', 'If-None-Match: {}\r\n'.format(etag)),
+            ('/data', 'If-None-Match: "x", W/{}\r\n'.format(etag)),
+            ('/data', 'If-None-Match: *\r\n'),
+            ('/data', 'If-Modified-Since: {}\r\n'.format(last_modified)),
+        ])
+        for status, headers, body in responses:
+            self.assertEqual(status, 304)
+            self.assertEqual(headers['etag'], etag)
+            self.assertEqual(body, b'')
+
+    def test_modified(self):
+        responses = self.run_requests([
+            ('/data', 'If-None-Match: "other"\r\n'),
+            # If-Modified-Since is ignored when If-None-Match is given
+            ('/data', 'If-None-Match: "other"\r\nIf-Modified-Since: '
+             'Thu, 01 Jan 1970 00:00:00 GMT\r\n'),
+            ('/data', 'If-Modified-Since: Thu, 01 Jan 1970 00:00:00 GMT\r\n'),
+        ])
+        for status, headers, body in responses:
+            self.assertEqual(status, 200)
+            self.assertEqual(body, self.data)
+
+    def test_changed_file_gets_new_etag(self):
+        (_, headers, _), = self.run_requests([('/data', '')])
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        (status, _, body), = self.run_requests([
+            ('/data', 'If-None-Match: {}\r\n'.format(headers['etag']))])
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.data + b'more')
+
+    def test_gzip_accepted(self):
+        responses = self.run_requests([
+            ('/page.html', 'Accept-Encoding: gzip, deflate\r\n'),
+            ('/page.html', 'Accept-Encoding: x-gzip\r\n'),
+            ('/page.html', 'Accept-Encoding: *;q=0.5\r\n'),
+            # no Accept-Encoding header accepts any coding
+            ('/page.html', ''),
+        ])
+        for status, headers, body in responses:
+            self.assertEqual(status, 200)
+            self.assertEqual(headers['content-encoding'], 'gzip')
+            self.assertEqual(headers['vary'], 'Accept-Encoding')
+            self.assertEqual(body, self.gzipped)
+
+    def test_identity_file_when_gzip_not_accepted(self):
+        responses = self.run_requests([
+            ('/page.html', 'Accept-Encoding: identity\r\n'),
+            ('/page.html', 'Accept-Encoding: gzip;q=0, deflate\r\n'),
+            ('/page.html', 'Accept-Encoding: *;q=0\r\n'),
+        ])
+        for status, headers, body in responses:
+            self.assertEqual(status, 200)
+            self.assertNotIn('content-encoding', headers)
+            self.assertEqual(headers['vary'], 'Accept-Encoding')
+            self.assertEqual(headers['content-length'], str(len(self.data)))
+            self.assertEqual(body, self.data)
+
+    def test_decompressed_when_no_identity_file(self):
+        (_, gzip_headers, _), (status, headers, body) = self.run_requests([
+            ('/only.js', 'Accept-Encoding: gzip\r\n'),
+            ('/only.js', 'Accept-Encoding: identity\r\n'),
+        ])
+        self.assertEqual(status, 200)
+        self.assertNotIn('content-encoding', headers)
+        self.assertNotIn('content-length', headers)
+        self.assertEqual(body, self.data)
+        # each representation has its own entity tag
+        self.assertNotEqual(headers['etag'], gzip_headers['etag'])
+
+    def check_ranges(self):
+        size = len(self.data)
+        responses = self.run_requests([
+            ('/data', 'Range: bytes=0-99\r\n'),
+            ('/data', 'Range: bytes=4000-\r\n'),
+            ('/data', 'Range: bytes=-100\r\n'),
+            ('/data', 'Range: bytes=4000-9999\r\n'),
+        ])
+        for (status, headers, body), (first, last) in zip(
+                responses, [(0, 99), (4000, size - 1), (size - 100, size - 1),
+                            (4000, size - 1)]):
+            self.assertEqual(status, 206)
+            self.assertEqual(headers['content-range'],
+                             'bytes {}-{}/{}'.format(first, last, size))
+            self.assertEqual(headers['content-length'], str(last - first + 1))
+            self.assertEqual(body, self.data[first:last + 1])
+
+    def test_range(self):
+        self.check_ranges()
+
+    def test_range_from_cache(self):
+        Response.send_file_cache = AssetCache()
+        self.addCleanup(setattr, Response, 'send_file_cache', None)
+        self.check_ranges()
+        self.check_ranges()
+        self.assertEqual(Response.send_file_cache.stats()['hits'], 7)
+
+    def test_range_not_satisfiable(self):
+        size = len(self.data)
+        responses = self.run_requests([
+            ('/data', 'Range: bytes={}-\r\n'.format(size)),
+            ('/data', 'Range: bytes=-0\r\n'),
+        ])
+        for status, headers, body in responses:
+            self.assertEqual(status, 416)
+            self.assertEqual(headers['content-range'],
+                             'bytes */{}'.format(size))
+            self.assertEqual(body, b'')
+
+    def test_range_ignored(self):
+        (_, headers, _), = self.run_requests([('/data', '')])
+        self.assertEqual(headers['accept-ranges'], 'bytes')
+        responses = self.run_requests([
+            ('/data', 'Range: bytes=0-9, 20-29\r\n'),
+            ('/data', 'Range: bytes=10-5\r\n'),
+            ('/data', 'Range: items=0-9\r\n'),
+            ('/data', 'Range: bytes=0-9\r\nIf-Range: "old"\r\n'),
+        ])
+        for status, headers, body in responses:
+            self.assertEqual(status, 200)
+            self.assertEqual(body, self.data)
+
+        (status, _, body), = self.run_requests([
+            ('/data', 'Range: bytes=0-9\r\nIf-Range: {}\r\n'.format(
+                headers['etag']))])
+        self.assertEqual(status, 206)
+        self.assertEqual(body, self.data[:10])
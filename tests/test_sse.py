@@ -0,0 +1,87 @@
+import asyncio
+import unittest
+
+from microdot import Microdot
+from microdot.sse import SSE, with_sse
+
+from tests.test_microdot import start, stop
+
+
+class TestSSE(unittest.TestCase):
+    def test_overflow_ends_stream(self):
+        app = Microdot()
+
+        @app.route('/events')
+        @with_sse
+        async def events(request, sse):
+            for i in range(SSE.max_queue + 1):
+                await sse.send(str(i), event_id=i)
+            await sse.wait_closed()
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(b'GET /events HTTP/1.0\r\n\r\n')
+                await writer.drain()
+                data = await asyncio.wait_for(reader.read(), 2)
+                writer.close()
+                self.assertIn(b'text/event-stream', data)
+                # no events after a gap, the client reconnects instead
+                self.assertNotIn(b'data:', data)
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_request_after_stream_takes_a_slot(self):
+        app = Microdot()
+        app.keep_alive = True
+        app.max_connections = 1
+
+        @app.route('/events')
+        @with_sse
+        async def events(request, sse):
+            await sse.send('hello')
+
+        @app.route('/active')
+        async def active(request):
+            return str(app.active_connections)
+
+        async def main():
+            task, port = await start(app)
+            try:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port)
+                writer.write(b'GET /events HTTP/1.1\r\n\r\n')
+                await writer.drain()
+                # the chunked stream ends with an empty chunk
+                await asyncio.wait_for(reader.readuntil(b'0\r\n\r\n'), 2)
+                writer.write(b'GET /active HTTP/1.1\r\n\r\n')
+                await writer.drain()
+                data = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                              2)
+                self.assertIn(b'200', data.split(b'\r\n')[0])
+                self.assertEqual(await reader.read(1), b'1')
+                writer.close()
+            finally:
+                await stop(app, task)
+
+        asyncio.run(main())
+
+    def test_send_nowait(self):
+        class FakeRequest:
+            headers = {}
+
+        sse = SSE(FakeRequest())
+        sse.send_nowait({'a': 1}, event='update', event_id=3)
+        self.assertEqual(sse.queue,
+                         [b'event: update\nid: 3\ndata: {"a": 1}\n\n'])
+        self.assertTrue(sse.event.is_set())
+        for i in range(SSE.max_queue):
+            sse.send_nowait(str(i))
+        self.assertTrue(sse.overflowed)
+        self.assertEqual(sse.queue, [])
+        sse.send_nowait('late')
+        self.assertEqual(sse.queue, [])
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import random
+import unittest
+from unittest import mock
+
+from microdot.sse import SSE
+from model.websocket import client_queue, web_socket_manager
+from model.websocket.client_queue import merge_deltas
+from model.websocket.web_socket_manager import WebSocketManager
+
+
+class FakeClock:
+    """Stands in for the MicroPython ticks functions of the time module"""
+    def __init__(self):
+        self.now = 1000
+
+    def ticks_ms(self):
+        return self.now
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+
+class FakeWriter:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeRequest:
+    def __init__(self):
+        self.headers = {}
+        self.sock = (None, FakeWriter())
+
+
+class FakeWebSocket:
+    """Collects the payloads of the frames sent to it. While blocked, sending
+    a frame does not complete, like a client that stopped reading."""
+    def __init__(self, blocked=False):
+        self.request = FakeRequest()
+        self.closed = False
+        self.frames = []
+        self.sent = []
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def send_frame(self, frame):
+        await self.unblocked.wait()
+        self.frames.append(frame)
+        n = frame[1] & 0x7f
+        offset = 2
+        if n == 126:
+            offset = 4
+        elif n == 127:
+            offset = 10
+        self.sent.append(frame[offset:].decode())
+
+
+def apply_delta(state, delta):
+    for key, value in delta.items():
+        if key in ('type', 'seq', 'base'):
+            continue
+        if isinstance(value, dict):
+            state.setdefault(key, {}).update(value)
+        else:
+            state[key] = value
+
+
+class Client:
+    """The delta handling of the dashboard (handleDelta in
+    audio-dashboard.js)"""
+    def __init__(self, seq):
+        self.seq = seq
+        self.state = {}
+        self.resyncs = 0
+
+    def receive(self, message):
+        message = json.loads(message)
+        if message['seq'] <= self.seq:
+            return
+        base = message.get('base', message['seq'] - 1)
+        if base > self.seq:
+            self.resyncs += 1
+            return
+        self.seq = message['seq']
+        apply_delta(self.state, message)
+
+
+class TestWebSocketManager(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for module in (client_queue, web_socket_manager):
+            patcher = mock.patch.object(module, 'time', self.clock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_broadcast_encodes_once(self):
+        async def main():
+            manager = WebSocketManager()
+            clients = [FakeWebSocket() for _ in range(3)]
+            for ws in clients:
+                manager.add_client(ws)
+            sse = SSE(FakeRequest())
+            manager.add_sse_client(sse)
+            manager.broadcast('hello')
+            await asyncio.sleep(0.01)
+            for ws in clients:
+                self.assertEqual(ws.sent, ['hello'])
+                self.assertIs(ws.frames[0], clients[0].frames[0])
+                manager.remove_client(ws)
+            self.assertEqual(sse.queue, [b'id: 1\ndata: hello\n\n'])
+            self.assertEqual(manager.messages_sent, 4)
+
+        asyncio.run(main())
+
+    def test_queue_coalesces_topics(self):
+        async def main():
+            manager = WebSocketManager(queue_size=4)
+            ws = FakeWebSocket(blocked=True)
+            manager.add_client(ws)
+            for i in range(5):
+                manager.broadcast('metrics {}'.format(i), topic='metrics')
+            manager.broadcast('log')
+            self.assertEqual(len(manager.clients[ws]), 2)
+            self.assertEqual(manager.frames_coalesced, 4)
+            ws.unblocked.set()
+            await asyncio.sleep(0.01)
+            self.assertEqual(ws.sent, ['metrics 4', 'log'])
+            manager.remove_client(ws)
+
+        asyncio.run(main())
+
+    def test_overflowing_client_is_dropped_after_stall_timeout(self):
+        async def main():
+            manager = WebSocketManager(queue_size=2, stall_timeout=1)
+            slow = FakeWebSocket(blocked=True)
+            fast = FakeWebSocket()
+            manager.add_client(slow)
+            manager.add_client(fast)
+            try:
+                for i in range(4):
+                    manager.broadcast(str(i))
+                    await asyncio.sleep(0.01)
+                # the slow client is sending '0' with '1' and '2' queued, so
+                # '3' is dropped, but it has not been over its limit for long
+                self.assertIn(slow, manager.clients)
+                self.assertEqual(manager.frames_dropped, 1)
+
+                self.clock.now += 1001
+                manager.broadcast('4')
+                await asyncio.sleep(0.01)
+                self.assertNotIn(slow, manager.clients)
+                self.assertIn(fast, manager.clients)
+                self.assertEqual(manager.clients_disconnected, 1)
+                self.assertTrue(slow.closed)
+                self.assertTrue(slow.request.sock[1].closed)
+                self.assertEqual(fast.sent, ['0', '1', '2', '3', '4'])
+            finally:
+                slow.unblocked.set()
+                manager.remove_client(fast)
+
+        asyncio.run(main())
+
+    def test_client_that_stops_reading_is_dropped(self):
+        async def main():
+            manager = WebSocketManager(send_timeout=0.05)
+            ws = FakeWebSocket(blocked=True)
+            manager.add_client(ws)
+            manager.broadcast('hello')
+            await asyncio.sleep(0.2)
+            self.assertNotIn(ws, manager.clients)
+            self.assertEqual(manager.clients_disconnected, 1)
+            self.assertTrue(ws.request.sock[1].closed)
+
+        asyncio.run(main())
+
+    def test_merged_deltas_apply_like_each_delta(self):
+        rng = random.Random(1234)
+        fields = {'eq': ['low', 'mid', 'high'], 'uart': ['g1', 'g2', 'pan']}
+        for _ in range(200):
+            deltas = []
+            for seq in range(1, rng.randint(2, 8)):
+                delta = {'type': 'delta', 'seq': seq}
+                if rng.random() < 0.5:
+                    delta['mode'] = rng.choice(['auto', 'manual'])
+                for group, keys in fields.items():
+                    if rng.random() < 0.7:
+                        delta[group] = {key: rng.randint(0, 100)
+                                        for key in rng.sample(
+                                            keys, rng.randint(1, 3))}
+                deltas.append(delta)
+
+            expected = {}
+            for delta in deltas:
+                apply_delta(expected, delta)
+            merged = deltas[0]
+            for delta in deltas[1:]:
+                merged = merge_deltas(merged, delta)
+            state = {}
+            apply_delta(state, merged)
+            self.assertEqual(state, expected)
+            if len(deltas) > 1:
+                self.assertEqual(merged['base'], 0)
+                self.assertEqual(merged['seq'], deltas[-1]['seq'])
+            # merging does not change the queued deltas
+            self.assertNotIn('base', deltas[0])
+
+    def test_client_behind_gets_merged_delta(self):
+        async def main():
+            manager = WebSocketManager()
+            ws = FakeWebSocket(blocked=True)
+            manager.add_client(ws)
+            client = Client(manager.seq)
+            await asyncio.sleep(0)
+            for i in range(1, 6):
+                manager.broadcast_uart_state({'g1': i / 10, 'pan': -i / 10})
+                manager.broadcast_mode_change('mode {}'.format(i))
+                await asyncio.sleep(0)
+            ws.unblocked.set()
+            await asyncio.sleep(0.01)
+
+            # the first delta was being sent, the rest were merged
+            self.assertEqual(len(ws.sent), 2)
+            self.assertEqual(json.loads(ws.sent[1])['base'],
+                             json.loads(ws.sent[0])['seq'])
+            for message in ws.sent:
+                client.receive(message)
+            self.assertEqual(client.resyncs, 0)
+            self.assertEqual(client.seq, manager.seq)
+            self.assertEqual(client.state, {'uart': {'g1': 0.5, 'pan': -0.5},
+                                            'mode': 'mode 5'})
+            manager.remove_client(ws)
+
+        asyncio.run(main())
+
+    def test_missed_delta_needs_resync(self):
+        async def main():
+            manager = WebSocketManager()
+            ws = FakeWebSocket()
+            manager.add_client(ws)
+            for i in range(3):
+                manager.broadcast_mode_change(i)
+                await asyncio.sleep(0.01)
+            self.assertEqual([json.loads(m)['seq'] for m in ws.sent],
+                             [1, 2, 3])
+
+            client = Client(0)
+            client.receive(ws.sent[0])
+            client.receive(ws.sent[2])
+            self.assertEqual(client.resyncs, 1)
+            self.assertEqual(client.seq, 1)
+            # deltas already included in the snapshot are ignored
+            client = Client(2)
+            client.receive(ws.sent[1])
+            client.receive(ws.sent[2])
+            self.assertEqual(client.resyncs, 0)
+            self.assertEqual(client.state, {'mode': 2})
+            manager.remove_client(ws)
+
+        asyncio.run(main())
+
+    def test_eq_updates_are_throttled(self):
+        async def main():
+            manager = WebSocketManager(eq_interval_ms=20)
+            manager.broadcast_eq_update({'low': 0, 'mid': 0, 'high': 0})
+            self.assertEqual(manager.seq, 1)
+
+            self.clock.now += 5
+            for i in range(1, 11):
+                manager.broadcast_eq_update({'eq': {'low': i, 'mid': i * 2,
+                                                    'high': i * 3}})
+            self.assertEqual(manager.seq, 1)
+            self.assertEqual(manager.eq_updates_merged, 9)
+
+            self.clock.now += 15
+            await asyncio.sleep(0.05)
+            self.assertEqual(manager.seq, 2)
+            self.assertIsNone(manager.eq_pending)
+            message = json.loads(manager.history[-1][1])
+            self.assertEqual(message['eq'], {'low': 10, 'mid': 20,
+                                             'high': 30})
+
+            # once the interval has passed, an update is sent right away
+            self.clock.now += 20
+            manager.broadcast_eq_update({'low': 1, 'mid': 1, 'high': 1})
+            self.assertEqual(manager.seq, 3)
+
+        asyncio.run(main())
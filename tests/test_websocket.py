@@ -0,0 +1,99 @@
+import asyncio
+import os
+import unittest
+
+from microdot.websocket import WebSocket, WebSocketError, _unmask
+
+MASK = b'\x37\xfa\x21\x3d'
+
+
+def mask_payload(payload, mask):
+    return bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
+
+
+def client_frame(opcode, payload, mask=MASK):
+    """Encode a frame as a client sends it, with a masked payload"""
+    frame = bytearray([0x80 | opcode])
+    if len(payload) < 126:
+        frame.append(0x80 | len(payload))
+    elif len(payload) < (1 << 16):
+        frame.append(0x80 | 126)
+        frame.extend(len(payload).to_bytes(2, 'big'))
+    else:
+        frame.append(0x80 | 127)
+        frame.extend(len(payload).to_bytes(8, 'big'))
+    return bytes(frame) + mask + mask_payload(payload, mask)
+
+
+class SlowStream:
+    """Returns at most a few bytes on each read, like a slow network"""
+    def __init__(self, data, step=7):
+        self.data = data
+        self.step = step
+
+    async def read(self, n=-1):
+        if n < 0:
+            n = len(self.data)
+        data, self.data = self.data[:min(n, self.step)], \
+            self.data[min(n, self.step):]
+        return data
+
+
+class FakeRequest:
+    def __init__(self, stream):
+        self.sock = (stream, None)
+
+
+class TestWebSocket(unittest.TestCase):
+    def test_unmask(self):
+        for n in list(range(12)) + [255, 256, 257, 1000, 4096]:
+            payload = os.urandom(n)
+            buf = bytearray(payload + b'extra')
+            _unmask(buf, MASK, n)
+            self.assertEqual(bytes(buf[:n]), mask_payload(payload, MASK))
+            # bytes past the payload are not touched
+            self.assertEqual(bytes(buf[n:]), b'extra')
+
+    def test_read_frames_into_reused_buffer(self):
+        big = os.urandom(70000)
+        frames = client_frame(WebSocket.BINARY, big) + \
+            client_frame(WebSocket.TEXT, 'hello'.encode()) + \
+            client_frame(WebSocket.BINARY, b'') + \
+            client_frame(WebSocket.BINARY, bytes(range(200)),
+                         b'\x01\x02\x03\x04')
+
+        async def main():
+            ws = WebSocket(FakeRequest(SlowStream(frames, step=1000)))
+            ws.max_message_length = 0x20000
+            self.assertEqual(await ws._read_frame(), (WebSocket.BINARY, big))
+            buffer = ws.buffer
+            self.assertEqual(len(buffer), len(big))
+            self.assertEqual(await ws.receive(), 'hello')
+            self.assertEqual(await ws._read_frame(), (WebSocket.BINARY, b''))
+            self.assertEqual(await ws.receive(), bytes(range(200)))
+            self.assertIs(ws.buffer, buffer)
+
+        asyncio.run(main())
+
+    def test_payloads_do_not_share_the_buffer(self):
+        frames = client_frame(WebSocket.BINARY, b'first') + \
+            client_frame(WebSocket.BINARY, b'second')
+
+        async def main():
+            ws = WebSocket(FakeRequest(SlowStream(frames)))
+            first = await ws.receive()
+            second = await ws.receive()
+            self.assertEqual((first, second), (b'first', b'second'))
+            self.assertIsInstance(first, bytes)
+
+        asyncio.run(main())
+
+    def test_connection_closed_during_payload(self):
+        frame = client_frame(WebSocket.BINARY, b'0123456789')
+
+        async def main():
+            ws = WebSocket(FakeRequest(SlowStream(frame[:-3])))
+            with self.assertRaises(WebSocketError):
+                await ws._read_frame()
+
+        asyncio.run(main())
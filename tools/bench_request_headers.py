@@ -0,0 +1,125 @@
+"""
+Benchmark for parsing the request line and headers in Request.create
+
+Compares the current Request.create, which keeps header lines as bytes and
+decodes them on access, against the header parsing it replaced, which
+decoded every line into a NoCaseDict. Reports the best time per request
+over several alternating runs and the peak memory allocated per request,
+for a typical browser request.
+
+Usage: python tools/bench_request_headers.py [iterations]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lib'))
+
+from microdot import Microdot, Request  # noqa: E402
+from microdot.microdot import AsyncBytesIO, NoCaseDict  # noqa: E402
+
+REQUEST = (
+    b'GET /static/scripts/audio-dashboard.js HTTP/1.1\r\n'
+    b'Host: 192.168.4.1\r\n'
+    b'Connection: keep-alive\r\n'
+    b'User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    b'(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36\r\n'
+    b'Accept: */*\r\n'
+    b'Referer: http://192.168.4.1/\r\n'
+    b'Accept-Encoding: gzip, deflate\r\n'
+    b'Accept-Language: en-US,en;q=0.9\r\n'
+    b'If-None-Match: "5f3a-1c2b"\r\n'
+    b'Cache-Control: max-age=0\r\n'
+    b'Sec-Fetch-Mode: no-cors\r\n'
+    b'\r\n')
+
+
+async def create_before(app, client_reader, client_writer, client_addr):
+    """Request.create as it was before header lines were decoded lazily"""
+    line = (await Request._safe_readline(client_reader)).strip().decode()
+    if not line:
+        return None
+    method, url, http_version = line.split()
+    http_version = http_version.split('/', 1)[1]
+
+    headers = NoCaseDict()
+    content_length = 0
+    while True:
+        line = (await Request._safe_readline(
+            client_reader)).strip().decode()
+        if line == '':
+            break
+        header, value = line.split(':', 1)
+        value = value.strip()
+        headers[header] = value
+        if header.lower() == 'content-length':
+            content_length = int(value)
+
+    body = b''
+    if content_length and content_length <= Request.max_body_length:
+        body = await client_reader.readexactly(content_length)
+        stream = None
+    else:
+        stream = client_reader
+    return Request(app, client_addr, method, url, http_version, headers,
+                   body=body, stream=stream,
+                   sock=(client_reader, client_writer))
+
+
+def run(coro):
+    # the in-memory stream never suspends, so no event loop is needed
+    try:
+        coro.send(None)
+    except StopIteration as exc:
+        return exc.value
+    raise RuntimeError('coroutine suspended')
+
+
+def handle(create, app):
+    req = run(create(app, AsyncBytesIO(REQUEST), None, ('127.0.0.1', 1234)))
+    # the headers a static file request looks at
+    req.headers.get('Accept-Encoding')
+    req.headers.get('If-None-Match')
+    req.headers.get('Range')
+    return req
+
+
+def measure(creates, app, iterations, repeat=20):
+    """Return the best time per request and the peak memory of each create
+
+    The implementations are timed in alternation, so that changes in the
+    load of the machine affect all of them alike.
+    """
+    results = {}
+    for name, create in creates:
+        handle(create, app)
+        tracemalloc.start()
+        handle(create, app)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = [None, peak]
+
+    for _ in range(repeat):
+        for name, create in creates:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                handle(create, app)
+            t = (time.perf_counter() - start) / iterations
+            if results[name][0] is None or t < results[name][0]:
+                results[name][0] = t
+    return results
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    creates = (('before', create_before), ('after', Request.create))
+    results = measure(creates, Microdot(), iterations)
+    for name, _ in creates:
+        elapsed, peak = results[name]
+        print('{:6}  {:7.1f} us  {:6d} bytes peak'.format(
+            name, elapsed * 1e6, peak))
+
+
+if __name__ == '__main__':
+    main()
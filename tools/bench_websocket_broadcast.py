@@ -0,0 +1,92 @@
+"""
+Benchmark for broadcasting a message to many WebSocket clients
+
+Simulates a storm of dial updates broadcast to N clients that accept every
+write immediately, and compares the two ways of fanning out a message:
+- before: one task per client, each encoding its own copy of the frame
+  with WebSocket.send()
+- after: the frame is encoded once with WebSocket.encode_frame() and a
+  single task writes it to every client with WebSocket.send_frame()
+
+Task scheduling is included in the time per update.
+
+Usage: python tools/bench_websocket_broadcast.py [updates]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lib'))
+
+from microdot.websocket import WebSocket  # noqa: E402
+
+CLIENTS = (1, 2, 4, 8, 16)
+
+
+class FakeWriter:
+    async def awrite(self, data):
+        pass
+
+
+class FakeRequest:
+    def __init__(self):
+        self.sock = (None, FakeWriter())
+
+
+def dial_message(i):
+    return json.dumps({'type': 'dial', 'low': i % 12, 'mid': 0,
+                       'high': -(i % 12),
+                       'control_sources': {'low': 'physical'}})
+
+
+def broadcast_before(clients, message):
+    for ws in clients:
+        asyncio.create_task(ws.send(message))
+
+
+async def send_frame(clients, frame):
+    for ws in clients:
+        await ws.send_frame(frame)
+
+
+def broadcast_after(clients, message):
+    frame = WebSocket.encode_frame(message)
+    asyncio.create_task(send_frame(clients, frame))
+
+
+async def storm(broadcast, clients, updates):
+    messages = [dial_message(i) for i in range(updates)]
+    start = time.perf_counter()
+    for message in messages:
+        broadcast(clients, message)
+        # let the writes of this update run, as the dial loop would
+        await asyncio.sleep(0)
+    # wait for any writes that are still pending
+    while len(asyncio.all_tasks()) > 1:
+        await asyncio.sleep(0)
+    return (time.perf_counter() - start) / updates
+
+
+async def measure(broadcast, clients, updates, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t = await storm(broadcast, clients, updates)
+        best = t if best is None else min(best, t)
+    return best
+
+
+async def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print('clients   per-client tasks   encode-once')
+    for n in CLIENTS:
+        clients = [WebSocket(FakeRequest()) for _ in range(n)]
+        before = await measure(broadcast_before, clients, updates)
+        after = await measure(broadcast_after, clients, updates)
+        print('{:7d}   {:13.1f} us   {:8.1f} us   ({:.1f}x)'.format(
+            n, before * 1e6, after * 1e6, before / after))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+"""
+Benchmark for unmasking WebSocket payloads received from clients
+
+Compares the per-byte generator that _read_frame used before with the
+in-place unmask() that replaced it, including the copy of the payload into
+the reusable buffer and the copy of the result out of it. On CPython the
+chunked fallback is measured; the viper version only runs on MicroPython.
+
+Usage: python tools/bench_websocket_unmask.py [megabytes]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lib'))
+
+from microdot.websocket import unmask  # noqa: E402
+
+SIZES = (16, 64, 256, 1024, 4096)
+MASK = b'\x37\xfa\x21\x3d'
+
+
+def unmask_before(payload, mask):
+    return bytes(x ^ mask[i % 4] for i, x in enumerate(payload))
+
+
+BUFFER = bytearray(max(SIZES))
+
+
+def unmask_after(payload, mask):
+    n = len(payload)
+    BUFFER[:n] = payload
+    unmask(BUFFER, mask, n)
+    return bytes(memoryview(BUFFER)[:n])
+
+
+def throughput(f, payload, total, repeat=3):
+    """Return the best throughput in MB/s of f over a few runs"""
+    iterations = max(1, total // len(payload))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            f(payload, MASK)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return iterations * len(payload) / best / 1e6
+
+
+def main():
+    total = int(float(sys.argv[1]) * 1e6) if len(sys.argv) > 1 else 4000000
+    print('  size     before      after')
+    for size in SIZES:
+        payload = os.urandom(size)
+        assert unmask_before(payload, MASK) == unmask_after(payload, MASK)
+        before = throughput(unmask_before, payload, total)
+        after = throughput(unmask_after, payload, total)
+        print('{:6d} B {:6.1f} MB/s {:6.1f} MB/s  ({:.0f}x)'.format(
+            size, before, after, after / before))
+
+
+if __name__ == '__main__':
+    main()